@@ -0,0 +1,18 @@
+r"""Headless core of the TrajectoryGenerator.
+
+Generates walks and batch-jobs with NumPy, SciPy and h5py only, neither
+the GUI nor any plotting-library is imported. Batch- and job-files can be
+run with /python -m generation job.yaml/.
+"""
+from generation.walks import generate_walk, generate_walks, repair_walks, \
+    regenerate_walk, generate_simulated_walk, waypoint_noise, \
+    add_post_noise, walk_validator
+from generation.batch import RUNS_PER_UNIT, work_units, run_unit, \
+    run_units, iter_walks, run_cached_unit, batch_walk, read_simulations, \
+    read_config_file, read_configs
+from generation.cache import WalkCache
+from generation.packed import PackedWriter, PackedWalks
+from generation.writer import BackgroundWriter
+from generation.shards import ShardWriter, ShardDataset
+from generation.jobs import read_job_file, expand_sweeps
+from rejectionSampling import RejectionSamplingError, SamplingStats
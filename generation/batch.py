@@ -0,0 +1,581 @@
+r"""Batch-jobs writing walks to HDF5."""
+import os
+import json
+import hashlib
+from argparse import ArgumentParser
+from contextlib import ExitStack
+from collections import deque
+from multiprocessing import Pool
+
+import numpy as np
+import h5py
+
+from mapCreation import read_image
+from kinematics import compute_kinematics, kinematics_shapes, FEATURES
+from rejectionSampling import SamplingStats
+from randomStreams import TrajectoryStreams
+from generation.walks import generate_walks, generate_simulated_walk
+from generation.jobs import read_job_file, TRACE_KEYS
+from generation.cache import WalkCache
+from generation.packed import PackedWriter
+from generation.writer import BackgroundWriter
+from generation.shards import ShardWriter
+
+RUNS_PER_UNIT = 50
+
+# Configs agreeing in these keys share cached maps, covariance-factors
+# and interpolation-operators.
+CACHE_KEYS = ("path", "method", "cov_type", "length_scale", "len_total", \
+              "sampler", "kind", "factor")
+
+def cache_order(config):
+    r"""Sort-key grouping configs which share cached data."""
+    return tuple(str(config.get(key, "")) for key in CACHE_KEYS)
+
+def work_units(simulations):
+    r"""Splits the runs of all config-lines into work-units.
+
+    Every interpolated walk draws from its own stream, keyed by the master
+    seed, its config-line and its run, so the output never depends on the
+    units or on the number of workers. The walks of simulated units are
+    drawn together from one stream per unit, see `run_unit`.
+
+    The units are ordered by map and generation-settings first (see
+    `cache_order`), so units sharing cached data run one after another.
+
+    Parameters
+    ----------
+    simulations : *list*
+        Configs as returned by `read_simulations`.
+
+    Returns
+    -------
+    units : *list*
+        Tuples /(line, start, stop)/ covering runs /start/ to /stop/ of
+        config-line /line/.
+
+    """
+    units = []
+    for line, config in enumerate(simulations):
+        for start in range(0, config["nr_runs"], RUNS_PER_UNIT):
+            stop = min(start+RUNS_PER_UNIT, config["nr_runs"])
+            units.append((line, start, stop))
+    units.sort(key=lambda unit: (cache_order(simulations[unit[0]]),) + unit)
+    return units
+
+def run_unit(args):
+    r"""Generates the walks of a single work-unit, see `work_units`.
+
+    Simulated walks are drawn as bundles, so all walks of a unit share a
+    generator seeded by the master seed, the config-line and the first
+    run of the unit.
+    """
+    config, (line, start, stop), seed = args
+    if config["method"] == "Simulation":
+        walks = generate_simulated_walk(dict(config, n_total=stop-start), \
+                                        batch=True, \
+                                        rng=np.random.default_rng([seed, \
+                                                        line, start]), \
+                                        return_stats=True)
+    else:
+        walks = generate_walks(config, stop-start, batch=True, \
+                               rng=TrajectoryStreams(seed, line, \
+                                                     range(start, stop)), \
+                               return_stats=True)
+    if walks is None:
+        msg = "Could not create valid walks for config-line "+str(line)
+        raise RuntimeError(msg)
+    return walks
+
+def run_units(simulations, units, seed, workers=1, cache=None):
+    r"""Yields walks and `SamplingStats` of all /units/ in order.
+
+    With more than one worker the units are spread over a process-pool,
+    while the results are still yielded in the order of /units/. The
+    configs /simulations/ are indexed by config-line, a list or a dict.
+    At most
+    two units per worker are generated ahead of the consumer, so memory
+    does not grow with the number of units. Units found in the
+    `WalkCache` /cache/ are loaded instead of generated, generated units
+    are stored in it.
+    """
+    if cache is None:
+        keys = [None for unit in units]
+    else:
+        keys = [cache.key(simulations[unit[0]], unit, seed) \
+                for unit in units]
+    missing = [key is None or key not in cache for key in keys]
+    args = [(simulations[unit[0]], unit, seed) \
+            for unit, miss in zip(units, missing) if miss]
+    with ExitStack() as stack:
+        if workers > 1 and len(args) > 1:
+            pool = stack.enter_context(Pool(workers))
+            generated = bounded_imap(pool, run_unit, args, 2*workers)
+        else:
+            generated = map(run_unit, args)
+        for unit, key, miss in zip(units, keys, missing):
+            walks = None if miss else cache.get(key)
+            if walks is None:
+                # Entries evicted in the meantime are generated here.
+                walks = next(generated) if miss else \
+                        run_unit((simulations[unit[0]], unit, seed))
+                if cache is not None:
+                    cache.put(key, walks)
+            yield walks
+
+def bounded_imap(pool, func, args, window):
+    r"""Like /pool.imap/, but with at most /window/ pending tasks."""
+    pending = deque()
+    for arg in args:
+        if len(pending) == window:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (arg,)))
+    while pending:
+        yield pending.popleft().get()
+
+def iter_walks(config, n, chunk_size=RUNS_PER_UNIT, seed=None, workers=1, \
+               cache=None, line=0, return_stats=False):
+    r"""Yields the walks of /config/ chunk by chunk as they are generated.
+
+    Only a few chunks are held in memory at any time, independent of /n/,
+    so the walks can be fed into a training-pipeline or any other sink.
+    The chunks are the work-units of `batch_walk`, which consumes them
+    the same way.
+
+    Parameters
+    ----------
+    config : *dict*
+        Config of `generate_walks` or `generate_simulated_walk`, selected
+        by its /method/.
+    n : *int*
+        Total number of walks.
+    chunk_size : *int*
+        Number of walks per chunk, only the last chunk may be smaller.
+        Default is `RUNS_PER_UNIT`.
+    seed : *int*
+        Master seed, a random seed is drawn if *None*. Interpolated walks
+        only depend on the seed, the /line/ and their run, not on the
+        /chunk_size/. Simulated walks are drawn per chunk.
+    workers : *int*
+        Number of processes generating chunks. Default is 1.
+    cache : *WalkCache*
+        Cache of chunks, only used with a given /seed/. Default is *None*.
+    line : *int*
+        Config-line of the walks, selecting their random streams as in a
+        batch-job. Default is 0.
+    return_stats : *bool*
+        If *True* the `SamplingStats` of every chunk are yielded as well.
+
+    Yields
+    ------
+    pos, vel, acc : *array*
+        Positions /(c, L, 2)/, velocities /(c, L-1, 2)/ and accelerations
+        /(c, L-2, 2)/ of the /c/ walks of the chunk.
+
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+        cache = None
+    units = [(line, start, min(start+chunk_size, n)) \
+             for start in range(0, n, chunk_size)]
+    for walks in run_units({line: config}, units, seed, workers, cache):
+        yield walks if return_stats else walks[:-1]
+
+def run_cached_unit(config, unit, seed, cache=None):
+    r"""Generates the walks of a single /unit/ of /config/, see `run_unit`.
+
+    The walks are loaded from /cache/ if possible and stored otherwise.
+    """
+    return next(run_units([config], [unit], seed, cache=cache))
+
+def batch_walk(path, workers=1, seed=None, features=(), resume=False, \
+               cache=True, layout="groups", packing=None, output="hdf5", \
+               shard_size=10000):
+    r"""Generates all walks of a batch- or job-file and writes them to HDF5.
+
+    Every finished work-unit is recorded in a manifest next to the output
+    (see `write_manifest`) after its walks were flushed to the file. The
+    walk-groups are numbered by the position of their unit in
+    `work_units`, so a run continued with /resume/ writes the same file
+    as an uninterrupted one. Like `iter_walks`, the walks are streamed
+    unit by unit into the file, so the size of a job is only bounded by
+    the disk.
+
+    Parameters
+    ----------
+    path : *str*
+        Path to the batch-file or YAML job-file, see `read_simulations`.
+        The output is written to a /.hdf5/-file of the same name in the
+        working directory.
+    workers : *int*
+        Number of processes generating walks. Only a writer-thread of the
+        main process writes to the output-file, overlapping the I/O with
+        the generation, see `BackgroundWriter`. Default is 1.
+    seed : *int*
+        Master seed of the job. The output only depends on the seed, not on
+        the number of workers. A random seed is drawn if *None*. The seed
+        is stored in the /Seed/-attribute of the file and every walk-group
+        stores its config-line and run as /Job/ and /Index/, so single
+        interpolated walks can be rebuilt with `regenerate_walk`.
+    features : *iterable*
+        Derived features written in addition to velocity and acceleration,
+        e.g. /Speed/ for ‘speed’, see `compute_kinematics`.
+    resume : *bool*
+        If *True* and a manifest of an earlier run of the same file exists,
+        its finished units are skipped and the seed is taken from it.
+        Default is *False*.
+    cache : *bool*/*WalkCache*
+        Units of unchanged configs, maps and variance-files are loaded
+        from the `WalkCache` (the default cache if *True*) instead of
+        generated again. Only used with a given or resumed /seed/, as
+        walks of a random seed are never requested again. Default is
+        *True*.
+    layout : *str*
+        ‘groups’ writes a group with small datasets for every walk,
+        ‘packed’ all walks of a label into a few chunked datasets, see
+        `generation.packed`. Default is ‘groups’.
+    packing : *dict*
+        Keyword-arguments of the `PackedWriter` of layout ‘packed’, e.g.
+        /chunk_rows/, /compression/ and /shuffle/.
+    output : *str*
+        ‘hdf5’ or ‘npy’, which writes the positions as NPY-shards to a
+        directory /<name>_shards/ instead, see `generation.shards`. The
+        /features/ and the /layout/ only apply to HDF5, NPY-shards cannot
+        be resumed. Default is ‘hdf5’.
+    shard_size : *int*
+        Number of walks per NPY-shard. Default is 10000.
+
+    """
+    # Unknown features are rejected before any walk is generated.
+    kinematics_shapes((0, 0, 2), features)
+    if layout not in ("groups", "packed"):
+        raise ValueError("Invalid layout: "+str(layout))
+    if output not in ("hdf5", "npy"):
+        raise ValueError("Invalid output-format: "+str(output))
+    if output == "npy" and resume:
+        raise ValueError("Only HDF5-output can be resumed.")
+    simulations = read_simulations(path)
+    units = work_units(simulations)
+    first = np.cumsum([0]+[stop-start for _, start, stop in units])
+    out_path = os.path.split(path)[-1].split(".")[0]+".hdf5"
+    manifest = {"source": os.path.abspath(path), \
+                "fingerprint": job_fingerprint(simulations, features, \
+                                               layout), \
+                "units": []}
+    previous = read_manifest(out_path) if resume else None
+    if previous is not None and os.path.exists(out_path):
+        if previous["fingerprint"] != manifest["fingerprint"]:
+            msg = "Cannot resume "+out_path+", the job has changed since "+\
+                  "the interrupted run."
+            raise ValueError(msg)
+        if seed is not None and str(seed) != previous["seed"]:
+            msg = "Cannot resume "+out_path+" with seed "+str(seed)+\
+                  ", it was started with seed "+previous["seed"]
+            raise ValueError(msg)
+        seed = int(previous["seed"])
+        manifest["units"] = previous["units"]
+        mode = "a"
+    else:
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+            cache = False
+        mode = "w"
+    manifest["seed"] = str(seed)
+    if output == "hdf5" and mode == "w":
+        # Replaces the manifest of an earlier run before the file is
+        # truncated, so it never claims units of the old file.
+        write_manifest(out_path, manifest)
+
+    stats = [SamplingStats() for config in simulations]
+    done = set()
+    for line, start, stop, unit_stats in manifest["units"]:
+        stats[line] += SamplingStats(*unit_stats)
+        done.add((line, start, stop))
+    todo = [i for i, unit in enumerate(units) if unit not in done]
+    if done:
+        print("Resuming after "+str(len(done))+" of "+str(len(units))+\
+              " work-units...")
+    if cache is True:
+        cache = WalkCache()
+    elif cache is False:
+        cache = None
+    if output == "npy":
+        shard_dir = os.path.splitext(out_path)[0]+"_shards"
+        shard_walks(simulations, units, seed, shard_dir, shard_size, \
+                    workers, cache, stats)
+    else:
+        hdf5_walks(simulations, units, todo, done, first, seed, out_path, \
+                   mode, manifest, workers, cache, stats, features, layout, \
+                   packing)
+    for line, line_stats in enumerate(stats):
+        print("Config-line "+str(line)+": acceptance rate "+\
+              "{:.1%}".format(line_stats.acceptance_rate)+", "+\
+              str(line_stats.wasted)+" wasted samples")
+    if cache is not None:
+        print("Cache: "+str(cache.hits)+" of "+str(len(todo))+\
+              " work-units loaded from "+cache.root)
+    print("Done...")
+
+def shard_walks(simulations, units, seed, shard_dir, shard_size=10000, \
+                workers=1, cache=None, stats=None):
+    r"""Writes the positions of all /units/ as NPY-shards to /shard_dir/.
+
+    The `SamplingStats` of every config-line are added to /stats/, see
+    `batch_walk` for the other parameters.
+    """
+    labels = list(dict.fromkeys(config["Goal"] for config in simulations))
+    info = {"seed": str(seed), "configs": simulations}
+    with ShardWriter(shard_dir, shard_size, labels, info=info) as sink:
+
+        def write_unit(item):
+            unit, walks = item
+            line, start, stop = unit
+            sink.append(walks[0], labels.index(simulations[line]["Goal"]), \
+                        line, np.arange(start, stop))
+
+        with BackgroundWriter(write_unit) as writer:
+            for unit, walks in zip(units, run_units(simulations, units, \
+                                                    seed, workers, cache)):
+                if stats is not None:
+                    stats[unit[0]] += walks[-1]
+                writer.put((unit, walks))
+
+def hdf5_walks(simulations, units, todo, done, first, seed, out_path, mode, \
+               manifest, workers=1, cache=None, stats=None, features=(), \
+               layout="groups", packing=None):
+    r"""Writes the walks of the units /todo/ to the HDF5-file /out_path/.
+
+    The /done/ units are already in the file, which is opened in /mode/.
+    Every written unit is added to /manifest/ and its `SamplingStats` to
+    /stats/, see `batch_walk` for the other parameters.
+    """
+    with h5py.File(out_path, mode) as f:
+        f.attrs["Seed"] = str(seed)
+        packer = None
+        if layout == "packed":
+            packer = PackedWriter(f, **(packing or {}))
+            # Walks of an interrupted unit are dropped.
+            written = {config["Goal"]: 0 for config in simulations}
+            for line, start, stop in done:
+                written[simulations[line]["Goal"]] += stop-start
+            for label, walks in written.items():
+                packer.truncate(label, walks)
+
+        def write_unit(item):
+            # Runs on the writer-thread, a unit enters the manifest only
+            # after its walks are flushed.
+            i, walks = item
+            line, start, stop = units[i]
+            unit_stats = walks[-1]
+            if packer is None:
+                write_walks(f, simulations[line], units[i], walks[:-1], \
+                            first[i], features)
+            else:
+                pack_walks(packer, simulations[line], units[i], walks[:-1], \
+                           first[i], features)
+            f.flush()
+            manifest["units"].append([line, start, stop, \
+                                      [unit_stats.requested, unit_stats.drawn, \
+                                       unit_stats.valid, unit_stats.rounds]])
+            write_manifest(out_path, manifest)
+
+        todo_units = [units[i] for i in todo]
+        with BackgroundWriter(write_unit) as writer:
+            for i, walks in zip(todo, run_units(simulations, todo_units, \
+                                                seed, workers, cache)):
+                if stats is not None:
+                    stats[units[i][0]] += walks[-1]
+                writer.put((i, walks))
+        if "Images" not in f:
+            grp_im = f.create_group("Images")
+            grp_im.attrs["Type"] = "Images"
+            im = read_image(simulations[0]["path"])
+            grp_im.create_dataset("OriginalFrame", data=im)
+            # Hard link, both names share one dataset.
+            grp_im["OriginalGoals"] = grp_im["OriginalFrame"]
+        write_configs(f, simulations)
+        comment = ""
+        for i, config_dict in enumerate(simulations):
+            comment += "Simulation Nr. "+str(i)+": "+\
+                       str(config_dict["Goal"])+" ("+\
+                       str(config_dict["method"])+", "+\
+                       str(config_dict["nr_runs"])+" runs)\n"
+        f.attrs["Comment"] = comment+"Configs are stored in /Configs."
+
+def write_walks(f, config, unit, walks, first, features=()):
+    r"""Writes the walks of /unit/ as groups /first+1/, /first+2/, ...
+
+    Every group only holds the attributes /Job/, the config-line in the
+    /Configs/-dataset, and /Index/, the run of the walk, which together
+    with the /Seed/ of the file selects its random stream. Groups left
+    over from an interrupted attempt of the same unit are replaced.
+    """
+    line, start, stop = unit
+    all_pos, all_vel, all_acc = walks
+    if features:
+        derived = compute_kinematics(all_pos, config.get("dt", 1.0), \
+                                     features)
+    label = config["Goal"]
+    if label not in f.keys():
+        new_grp = f.create_group(label)
+        new_grp.attrs["Type"] = "Trajectory"
+    for n in range(len(all_pos)):
+        name = str(first+n+1)
+        if name in f[label]:
+            del f[label][name]
+        grp = f[label].create_group(name)
+        grp.create_dataset("Positions", data=all_pos[n])
+        grp.create_dataset("Velocity", data=all_vel[n])
+        grp.create_dataset("Acceleration", data=all_acc[n])
+        for feature in features:
+            grp.create_dataset(feature.capitalize(), \
+                               data=derived[feature][n])
+        grp.attrs["Job"] = line
+        grp.attrs["Index"] = start+n
+
+def pack_walks(packer, config, unit, walks, first, features=()):
+    r"""Appends the walks of /unit/ to the packed group of its label."""
+    line, start, stop = unit
+    all_pos, all_vel, all_acc = walks
+    arrays = {"Positions": all_pos, "Velocity": all_vel, \
+              "Acceleration": all_acc}
+    if features:
+        derived = compute_kinematics(all_pos, config.get("dt", 1.0), \
+                                     features)
+        for feature in features:
+            arrays[feature.capitalize()] = derived[feature]
+    runs = np.arange(len(all_pos))
+    packer.append(config["Goal"], arrays, {"Number": first+1+runs, \
+                                           "Job": np.full(len(runs), line), \
+                                           "Index": start+runs})
+
+def write_configs(f, simulations):
+    r"""Writes all configs as JSON-strings to the dataset /Configs/.
+
+    Entry /i/ belongs to config-line /i/, i.e. to all walks whose /Job/ is
+    /i/. See `read_configs`.
+    """
+    if "Configs" in f:
+        del f["Configs"]
+    configs = [json.dumps(config, sort_keys=True, \
+                          default=lambda value: np.asarray(value).tolist()) \
+               for config in simulations]
+    f.create_dataset("Configs", data=configs, dtype=h5py.string_dtype())
+
+def read_configs(f):
+    r"""Reads the configs of all config-lines written by `write_configs`.
+
+    Parameters
+    ----------
+    f : *h5py.File*
+        Output-file of `batch_walk`.
+
+    Returns
+    -------
+    simulations : *list*
+        One config per config-line, the trace as float-arrays.
+
+    """
+    simulations = []
+    for text in f["Configs"].asstr()[()]:
+        config = json.loads(text)
+        for key in TRACE_KEYS:
+            if key in config:
+                config[key] = np.asarray(config[key], dtype=float)
+        simulations.append(config)
+    return simulations
+
+def manifest_path(out_path):
+    r"""Path of the manifest belonging to the output-file /out_path/."""
+    return os.path.splitext(out_path)[0]+".manifest.json"
+
+def write_manifest(out_path, manifest):
+    r"""Atomically replaces the manifest of /out_path/ by /manifest/.
+
+    The manifest is a JSON-file with the seed, a fingerprint of the job
+    and the finished work-units as /[line, start, stop, stats]/. It is
+    written to a temporary file first and moved over the old one, so an
+    interrupted run always leaves a complete manifest.
+    """
+    path = manifest_path(out_path)
+    tmp_path = path+".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def read_manifest(out_path):
+    r"""Returns the manifest of /out_path/, *None* if there is none."""
+    path = manifest_path(out_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+def job_fingerprint(simulations, features=(), layout="groups"):
+    r"""SHA-256 of all configs, features and the layout, identifying a job.
+    """
+    content = json.dumps([simulations, list(features), layout], \
+                         sort_keys=True, \
+                         default=lambda value: np.asarray(value).tolist())
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def read_simulations(path):
+    r"""Reads the configs of a YAML job-file (/.yaml/, /.yml/, see
+    `generation.jobs`) or of a batch-file (see `read_config_file`)."""
+    if path.endswith((".yaml", ".yml")):
+        return read_job_file(path)
+    return read_config_file(path)
+
+def read_config_file(path):
+    try:
+        simulations = []
+        with open(path, "r") as f:
+            for line in f.readlines():
+                if line and not line.startswith("#"):
+                    p = [el.strip() for el in line.strip().split(",")]
+                    config = {}
+                    config["Goal"] = p[0]
+                    config["Origin"] = p[1]
+                    config["nr_runs"] = int(p[2])
+                    config["method"] = p[3]
+                    config["kind"] = p[4]
+                    config["factor"] = int(p[5])
+                    config["pre_noise"] = float(p[6])
+                    config["post_noise"] = float(p[7])
+                    config["path"] = p[8]
+                    config["x"] = np.fromstring(p[9][1:-1], sep=" ")
+                    config["y"] = np.fromstring(p[10][1:-1], sep=" ")
+                    assert len(config["x"]) == len(config["y"])
+                    simulations.append(config)
+        return simulations
+    except FileNotFoundError:
+        print("Input-File not found...")
+
+def main(argv=None):
+    r"""Command-line interface of the batch-mode, see `batch_walk`."""
+    AP = ArgumentParser(description="Generates the walks of a batch- or "+\
+                        "job-file without loading the GUI.")
+    AP.add_argument('batch')
+    AP.add_argument('-w', '--workers', type=int, default=1)
+    AP.add_argument('-s', '--seed', type=int)
+    AP.add_argument('-f', '--features', nargs='+', choices=FEATURES, \
+                    default=[])
+    AP.add_argument('-r', '--resume', action='store_true')
+    AP.add_argument('--no-cache', action='store_true')
+    AP.add_argument('--layout', choices=["groups", "packed"], \
+                    default="groups")
+    AP.add_argument('--chunk-rows', type=int, default=4096)
+    AP.add_argument('--compression', choices=["gzip", "lzf", "none"], \
+                    default="gzip")
+    AP.add_argument('--no-shuffle', action='store_true')
+    AP.add_argument('--format', choices=["hdf5", "npy"], default="hdf5")
+    AP.add_argument('--shard-size', type=int, default=10000)
+    args = AP.parse_args(argv)
+    packing = {"chunk_rows": args.chunk_rows, "shuffle": not args.no_shuffle, \
+               "compression": None if args.compression == "none" \
+                              else args.compression}
+    batch_walk(args.batch, args.workers, args.seed, args.features, \
+               args.resume, not args.no_cache, args.layout, packing, \
+               args.format, args.shard_size)
@@ -0,0 +1,162 @@
+r"""Content-addressed on-disk cache of generated walks."""
+import os
+import json
+import hashlib
+import threading
+
+import numpy as np
+
+from rejectionSampling import SamplingStats
+
+# Part of every key, to be increased whenever the generated walks change.
+CACHE_VERSION = 1
+
+# Keys which only label the walks but do not change them.
+LABEL_KEYS = ("Goal", "Origin", "nr_runs", "label")
+
+# Keys holding paths, their file-contents are hashed instead.
+FILE_KEYS = ("path", "base_path")
+
+def default_cache_dir():
+    r"""Cache-directory from /TRAJECTORY_CACHE_DIR/ or in the user's home."""
+    return os.environ.get("TRAJECTORY_CACHE_DIR", \
+                          os.path.join(os.path.expanduser("~"), ".cache", \
+                                       "TrajectoryGenerator"))
+
+class WalkCache(object):
+    r"""Size-bounded on-disk cache of the walks of work-units.
+
+    Every entry holds positions, velocities, accelerations and sampling
+    statistics of one unit as a /.npz/-file. It is keyed by the SHA-256 of
+    the config without its labels, the contents of the map and variance
+    files, the unit and the seed, see `key`. Entries are written to a
+    temporary file and moved into place, so concurrent or interrupted
+    runs never leave broken entries. Loading an entry renews its
+    modification time and the least recently used entries are deleted
+    once the cache exceeds /max_bytes/.
+
+    Parameters
+    ----------
+    root : *str*
+        Directory of the cache, see `default_cache_dir` if *None*.
+    max_bytes : *int*
+        Upper bound for the total size of all entries in bytes. Default
+        is 1 GiB.
+
+    """
+    def __init__(self, root=None, max_bytes=1024**3):
+        self.root = default_cache_dir() if root is None else root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def key(self, config, unit, seed):
+        r"""Returns the hex-key of the walks of /unit/ of /config/.
+
+        Parameters
+        ----------
+        config : *dict*
+            Config of the unit's line.
+        unit : *tuple*
+            Work-unit /(line, start, stop)/, the line selects the random
+            streams of the walks.
+        seed : *int*
+            Master seed of the run.
+
+        """
+        content = {"version": CACHE_VERSION, "unit": list(unit), \
+                   "seed": str(seed), "files": {}}
+        content["config"] = {key: value for key, value in config.items() \
+                             if key not in LABEL_KEYS}
+        for key in FILE_KEYS:
+            if key in config:
+                content["files"][key] = self.file_digest(config[key])
+        text = json.dumps(content, sort_keys=True, \
+                          default=lambda value: np.asarray(value).tolist())
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def file_digest(self, path):
+        r"""SHA-256 of the contents of /path/, cached per modification."""
+        stat = os.stat(path)
+        file_id = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if file_id in self._digests:
+                return self._digests[file_id]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024**2), b""):
+                digest.update(block)
+        with self._lock:
+            self._digests[file_id] = digest.hexdigest()
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key+".npz")
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def get(self, key):
+        r"""Returns /(pos, vel, acc, stats)/ of /key/, *None* if missing."""
+        path = self.path(key)
+        try:
+            with np.load(path) as entry:
+                walks = (entry["pos"], entry["vel"], entry["acc"], \
+                         SamplingStats(*entry["stats"].tolist()))
+            os.utime(path)
+        except (OSError, KeyError, ValueError):
+            return None
+        self.hits += 1
+        return walks
+
+    def put(self, key, walks):
+        r"""Stores /(pos, vel, acc, stats)/ under /key/ and evicts old ones.
+        """
+        pos, vel, acc, stats = walks
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path+"."+str(os.getpid())+".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, pos=pos, vel=vel, acc=acc, \
+                     stats=np.array([stats.requested, stats.drawn, \
+                                     stats.valid, stats.rounds]))
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def entries(self):
+        r"""Returns /(mtime, size, path)/ of all entries."""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".npz"):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        r"""Deletes least recently used entries above /max_bytes/."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        r"""Deletes all entries."""
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,122 @@
+r"""Structured job-files with parameter sweeps.
+
+A job-file is a YAML-document with a list of /jobs/ and optional
+/defaults/ shared by all of them. Every job holds the keys of a config of
+`generate_walks` or `generate_simulated_walk` plus /Goal/ (label of the
+walks) and /nr_runs/ (number of walks). Any key except the trace /x/ and
+/y/ may be given as a list, the job is then expanded into the Cartesian
+product of all these lists::
+
+    defaults:
+      path: maps/forumtracking_goals.png
+      post_noise: 1.0
+    jobs:
+      - Goal: Goal_1
+        nr_runs: 50
+        method: Interpolation
+        kind: cubic
+        factor: 10
+        pre_noise: [2, 5, 10]
+        x: [113, 117, 145, 188, 237, 252, 262]
+        y: [28, 117, 176, 229, 288, 338, 427]
+      - Goal: Goal_2
+        nr_runs: 20
+        method: Simulation
+        pre_noise: 5
+        n_base: 10
+        len_total: 100
+        len_base: 21
+        base_type: Linear
+        base_path: variance.npy
+        length_scale: [5.0, 10.0]
+        scale: 1.0
+        cov_type: Matern
+        x: [111, 109, 99, 98, 98]
+        y: [30, 132, 205, 305, 338]
+"""
+from itertools import product
+
+import numpy as np
+
+TRACE_KEYS = ("x", "y")
+
+REQUIRED_KEYS = {
+    "Interpolation": ("Goal", "nr_runs", "method", "path", "x", "y", \
+                      "pre_noise", "post_noise", "kind", "factor"),
+    "Simulation": ("Goal", "nr_runs", "method", "path", "x", "y", \
+                   "pre_noise", "post_noise", "n_base", "len_total", \
+                   "len_base", "base_type", "base_path", "length_scale", \
+                   "scale", "cov_type"),
+    }
+
+def read_job_file(path):
+    r"""Reads a YAML job-file and expands all parameter sweeps.
+
+    Parameters
+    ----------
+    path : *str*
+        Path to the job-file, see the module-documentation.
+
+    Returns
+    -------
+    simulations : *list*
+        Complete configs, one for each combination of swept values, in
+        the order of the jobs and their sweeps.
+
+    """
+    try:
+        import yaml
+    except ImportError:
+        msg = "Reading job-files needs PyYAML, install it via "+\
+              "'pip install pyyaml'."
+        raise ImportError(msg)
+    with open(path, "r") as f:
+        spec = yaml.safe_load(f)
+    if not isinstance(spec, dict) or not isinstance(spec.get("jobs"), list):
+        raise ValueError("Job-file "+path+" does not contain a list of jobs.")
+    defaults = spec.get("defaults") or {}
+    simulations = []
+    for number, job in enumerate(spec["jobs"]):
+        for config in expand_sweeps(dict(defaults, **job)):
+            check_config(config, "job "+str(number))
+            config["Goal"] = str(config["Goal"])
+            simulations.append(config)
+    return simulations
+
+def expand_sweeps(job):
+    r"""Expands every list-valued key of /job/ except the trace.
+
+    Parameters
+    ----------
+    job : *dict*
+        Config with single values or lists of values.
+
+    Returns
+    -------
+    configs : *list*
+        One config for each element of the Cartesian product of all
+        lists, the last swept key varying fastest. The trace is converted
+        to float-arrays.
+
+    """
+    swept = [key for key in job \
+             if key not in TRACE_KEYS and isinstance(job[key], list)]
+    configs = []
+    for values in product(*[job[key] for key in swept]):
+        config = dict(job, **dict(zip(swept, values)))
+        for key in TRACE_KEYS:
+            if key in config:
+                config[key] = np.asarray(config[key], dtype=float)
+        configs.append(config)
+    return configs
+
+def check_config(config, name="config"):
+    r"""Raises a *ValueError* if /config/ misses keys of its method."""
+    method = config.get("method")
+    if method not in REQUIRED_KEYS:
+        raise ValueError("Invalid method of "+name+": "+str(method))
+    missing = [key for key in REQUIRED_KEYS[method] if key not in config]
+    if missing:
+        raise ValueError("Missing keys of "+name+": "+", ".join(missing))
+    if len(config["x"]) != len(config["y"]):
+        raise ValueError("Trace of "+name+" has unequal lengths of x and y.")
@@ -0,0 +1,161 @@
+r"""Packed HDF5-layout storing all walks of a label in a few datasets.
+
+Instead of one group with three small datasets per walk, a packed label
+group holds one extendible, chunked dataset per quantity with the samples
+of all walks concatenated along the first axis, and an index of the
+walks::
+
+    <label>/Positions     (M, 2)    samples of all walks
+    <label>/Velocity      (M-N, 2)  one sample less per walk
+    <label>/Acceleration  (M-2N, 2) two samples less per walk
+    <label>/Offsets       (N,)      first row of each walk in Positions
+    <label>/Lengths       (N,)      number of positions of each walk
+    <label>/Number        (N,)      number of the walk in the job
+    <label>/Job, Index    (N,)      config-line and run of each walk
+
+Walks may have different lengths. A quantity with /Trim/ (attribute)
+samples less per walk than the positions stores walk /i/ in the rows
+/Offsets[i] - Trim*i/ to /Offsets[i] - Trim*i + Lengths[i] - Trim/.
+Packed label groups have the /Type/-attribute ‘PackedTrajectory’.
+"""
+import numpy as np
+
+INDEX_NAMES = ("Offsets", "Lengths", "Number", "Job", "Index")
+
+class PackedWriter(object):
+    r"""Appends batches of walks to packed label groups of an HDF5-file.
+
+    Parameters
+    ----------
+    f : *h5py.File*
+        File opened for writing.
+    chunk_rows : *int*
+        Number of rows per chunk of all datasets. Default is 4096.
+    compression : *str*
+        Compression-filter, ‘gzip’, ‘lzf’ or *None*. Default is ‘gzip’.
+    compression_opts : *int*
+        Level of the ‘gzip’-filter (0-9), the h5py-default if *None*.
+    shuffle : *bool*
+        If *True* the shuffle-filter is applied before compression, which
+        usually compresses floats considerably better. Default is *True*.
+
+    """
+    def __init__(self, f, chunk_rows=4096, compression="gzip", \
+                 compression_opts=None, shuffle=True):
+        if compression not in ("gzip", "lzf", None):
+            raise ValueError("Invalid compression-filter: "+str(compression))
+        self.f = f
+        self.chunk_rows = chunk_rows
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self.shuffle = shuffle and compression is not None
+
+    def append(self, label, arrays, index):
+        r"""Appends a batch of walks of equal length to group /label/.
+
+        Parameters
+        ----------
+        label : *str*
+            Name of the label group, created if necessary.
+        arrays : *dict*
+            Arrays of shape /(n, L_name, ...)/ by name, which must contain
+            the /Positions/ of shape /(n, L, 2)/. Every other array may
+            have up to /L/ samples per walk.
+        index : *dict*
+            Arrays of shape /(n,)/ for /Number/, /Job/ and /Index/.
+
+        """
+        grp = self.f.require_group(label)
+        grp.attrs["Type"] = "PackedTrajectory"
+        n, length = arrays["Positions"].shape[:2]
+        walks = len(grp["Offsets"]) if "Offsets" in grp else 0
+        rows = self._rows(grp, "Positions", walks)
+        columns = dict(index)
+        columns["Offsets"] = rows + length*np.arange(n)
+        columns["Lengths"] = np.full(n, length)
+        for name in INDEX_NAMES:
+            self._extend(grp, name, np.asarray(columns[name], dtype=np.int64))
+        for name, data in arrays.items():
+            trim = length - data.shape[1]
+            dataset = self._extend(grp, name, \
+                                   data.reshape((-1,)+data.shape[2:]))
+            dataset.attrs["Trim"] = trim
+
+    def truncate(self, label, walks):
+        r"""Drops all but the first /walks/ walks of group /label/."""
+        if label not in self.f:
+            return
+        grp = self.f[label]
+        for name in grp:
+            if name in INDEX_NAMES:
+                grp[name].resize(min(walks, len(grp[name])), axis=0)
+            else:
+                grp[name].resize(self._rows(grp, name, walks), axis=0)
+
+    def _rows(self, grp, name, walks):
+        # Number of rows of /name/ belonging to the first /walks/ walks.
+        if walks == 0 or name not in grp:
+            return 0
+        lengths = grp["Lengths"][:walks]
+        return int(lengths.sum() - grp[name].attrs.get("Trim", 0)*walks)
+
+    def _extend(self, grp, name, data):
+        if name not in grp:
+            chunks = (self.chunk_rows,)+data.shape[1:]
+            return grp.create_dataset(name, data=data, chunks=chunks, \
+                                      maxshape=(None,)+data.shape[1:], \
+                                      compression=self.compression, \
+                                      compression_opts=self.compression_opts, \
+                                      shuffle=self.shuffle)
+        dataset = grp[name]
+        start = len(dataset)
+        dataset.resize(start+len(data), axis=0)
+        dataset[start:] = data
+        return dataset
+
+class PackedWalks(object):
+    r"""Reader of a packed label group.
+
+    A single walk is read from the file on its own, so only the chunks
+    holding it are loaded. A quantity loaded as a whole by `data` is kept
+    and its walks are then returned as views without any copy.
+
+    Parameters
+    ----------
+    grp : *h5py.Group*
+        Packed label group, see the module-documentation.
+
+    """
+    def __init__(self, grp):
+        self.grp = grp
+        self.offsets = grp["Offsets"][()]
+        self.lengths = grp["Lengths"][()]
+        self._data = {}
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        return self.walk(i)
+
+    def data(self, name="Positions"):
+        r"""Loads and returns the concatenated samples of quantity /name/.
+        """
+        if name not in self._data:
+            self._data[name] = self.grp[name][()]
+        return self._data[name]
+
+    def walk(self, i, name="Positions"):
+        r"""Returns quantity /name/ of walk /i/.
+
+        A view of the loaded quantity if `data` was called for /name/,
+        otherwise only the rows of the walk are read from the file.
+        """
+        i = range(len(self))[i]
+        dataset = self.grp[name]
+        trim = dataset.attrs.get("Trim", 0)
+        start = self.offsets[i] - trim*i
+        stop = start + self.lengths[i] - trim
+        if name in self._data:
+            return self._data[name][start:stop]
+        return dataset[start:stop]
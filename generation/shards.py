@@ -0,0 +1,198 @@
+r"""Export of walks as NPY-shards for training-pipelines.
+
+A shard-directory holds fixed-size shards of walks and a /manifest.json/
+describing them. Shard /k/ consists of four files::
+
+    shard_<k>_positions.npy  (n, L_max, 2)  positions, zero-padded
+    shard_<k>_mask.npy       (n, L_max)     *True* for real positions
+    shard_<k>_labels.npy     (n,)           index into the labels
+    shard_<k>_seeds.npy      (n, 2)         config-line and run
+
+The config-line and run of an interpolated walk together with the master
+/seed/ of the manifest select its random stream, see `regenerate_walk`.
+Simulated walks are drawn as a bundle per work-unit, so they can only be
+regenerated with their whole unit, the runs /start/ to /stop/ of
+`work_units` holding the run, by `run_unit`. The manifest
+lists the labels, the configs of all config-lines and every shard with
+its files, its /offset/ (number of walks in the shards before it), its
+/count/ and its /max_length/. All shards but the last hold /shard_size/
+walks. `ShardDataset` memory-maps the shards, so any number of
+data-loader processes can read them without copying.
+"""
+import os
+import json
+
+import numpy as np
+
+SHARD_ARRAYS = ("positions", "mask", "labels", "seeds")
+
+MANIFEST_NAME = "manifest.json"
+
+class ShardWriter(object):
+    r"""Collects walks and writes them as NPY-shards.
+
+    At most one shard of walks is buffered, the manifest is written by
+    `close`.
+
+    Parameters
+    ----------
+    directory : *str*
+        Shard-directory, created if necessary.
+    shard_size : *int*
+        Number of walks per shard. Default is 10000.
+    labels : *list*
+        Names of the labels, walks are appended with their index.
+    max_length : *int*
+        Length all walks are padded to. If *None* every shard is padded to
+        its longest walk.
+    info : *dict*
+        Further entries of the manifest, e.g. /seed/ and /configs/.
+
+    """
+    def __init__(self, directory, shard_size=10000, labels=(), \
+                 max_length=None, info=None):
+        if shard_size < 1:
+            raise ValueError("Invalid shard-size: "+str(shard_size))
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shard_size = shard_size
+        self.max_length = max_length
+        self.manifest = dict(info or {}, labels=list(labels), \
+                             shard_size=shard_size, walks=0, shards=[])
+        self._pending = []
+        self._count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+    def append(self, pos, label, line, runs):
+        r"""Appends the walks /pos/ of shape /(n, L, 2)/.
+
+        Parameters
+        ----------
+        pos : *array*
+            Positions of /n/ walks of equal length.
+        label : *int*
+            Index of the label of all walks.
+        line : *int*
+            Config-line of all walks.
+        runs : *array_like*
+            Run of every walk.
+
+        """
+        if self.max_length is not None and pos.shape[1] > self.max_length:
+            msg = "Walks of length "+str(pos.shape[1])+" exceed the "+\
+                  "maximal length "+str(self.max_length)
+            raise ValueError(msg)
+        seeds = np.column_stack([np.full(len(pos), line), runs])
+        self._pending.append((pos, np.full(len(pos), label), seeds))
+        self._count += len(pos)
+        while self._count >= self.shard_size:
+            self._write_shard(self.shard_size)
+
+    def close(self):
+        r"""Writes the last, smaller shard and the manifest."""
+        if self._count > 0:
+            self._write_shard(self._count)
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        tmp_path = path+".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, \
+                      default=lambda value: np.asarray(value).tolist())
+        os.replace(tmp_path, path)
+
+    def _write_shard(self, n):
+        # Takes the first /n/ pending walks.
+        taken, rest, count = [], [], 0
+        for pos, labels, seeds in self._pending:
+            if count >= n:
+                rest.append((pos, labels, seeds))
+                continue
+            k = min(n-count, len(pos))
+            taken.append((pos[:k], labels[:k], seeds[:k]))
+            if k < len(pos):
+                rest.append((pos[k:], labels[k:], seeds[k:]))
+            count += k
+        self._pending = rest
+        self._count -= n
+
+        max_length = self.max_length or \
+                     max(pos.shape[1] for pos, _, _ in taken)
+        arrays = {"positions": np.zeros((n, max_length, 2)), \
+                  "mask": np.zeros((n, max_length), dtype=bool), \
+                  "labels": np.concatenate([labels for _, labels, _ in taken]\
+                                          ).astype(np.int32), \
+                  "seeds": np.concatenate([seeds for _, _, seeds in taken]\
+                                         ).astype(np.int64)}
+        row = 0
+        for pos, _, _ in taken:
+            arrays["positions"][row:row+len(pos), :pos.shape[1]] = pos
+            arrays["mask"][row:row+len(pos), :pos.shape[1]] = True
+            row += len(pos)
+
+        number = len(self.manifest["shards"])
+        shard = {"offset": self.manifest["walks"], "count": n, \
+                 "max_length": max_length}
+        for name in SHARD_ARRAYS:
+            shard[name] = "shard_{:05d}_{}.npy".format(number, name)
+            np.save(os.path.join(self.directory, shard[name]), arrays[name])
+        self.manifest["shards"].append(shard)
+        self.manifest["walks"] += n
+
+class ShardDataset(object):
+    r"""Memory-mapped reader of a shard-directory.
+
+    Shards are opened with /np.load(..., mmap_mode="r")/ on first access
+    by each process, so the dataset can be handed to data-loader workers
+    and only the pages actually read are loaded.
+
+    Parameters
+    ----------
+    directory : *str*
+        Shard-directory written by `ShardWriter`.
+
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_NAME), "r") as f:
+            self.manifest = json.load(f)
+        self.labels = self.manifest["labels"]
+        self.offsets = np.array([shard["offset"] \
+                                 for shard in self.manifest["shards"]])
+        self._shards = {}
+
+    def __getstate__(self):
+        # Every process maps the shards itself instead of copying them.
+        state = dict(self.__dict__)
+        state["_shards"] = {}
+        return state
+
+    def __len__(self):
+        return self.manifest["walks"]
+
+    def shard(self, k):
+        r"""Returns the memory-mapped arrays of shard /k/ by name."""
+        if k not in self._shards:
+            shard = self.manifest["shards"][k]
+            self._shards[k] = {name: np.load(os.path.join(self.directory, \
+                                                          shard[name]), \
+                                             mmap_mode="r") \
+                               for name in SHARD_ARRAYS}
+        return self._shards[k]
+
+    def __getitem__(self, i):
+        r"""Returns /(positions, mask, label, seed)/ of walk /i/.
+
+        /positions/ and /mask/ are padded to the /max_length/ of the shard
+        and are read-only views of the memory-map.
+        """
+        i = range(len(self))[i]
+        k = int(np.searchsorted(self.offsets, i, side="right")) - 1
+        arrays = self.shard(k)
+        j = i - self.offsets[k]
+        return arrays["positions"][j], arrays["mask"][j], \
+               int(arrays["labels"][j]), arrays["seeds"][j]
@@ -0,0 +1,331 @@
+r"""Generation of interpolated and simulated walks."""
+import numpy as np
+
+from mapCreation import load_map, load_distance_field, load_nearest_free
+from validation import validate_trace, validate_traces, validate_segments
+from noiseGeneration import add_noise, add_simple_noise, add_batch_noise, \
+    add_free_space_noise
+from simulators.interpolatedWalk import interpolated_walks, \
+    interpolation_operator, closed_traces
+from simulators.simulatedWalk import create_trajectories
+from randomStreams import TrajectoryStreams, POST_NOISE, REPAIR
+from kinematics import compute_kinematics
+from rejectionSampling import rejection_sample
+
+def generate_walk(config, batch=False):
+    r"""Generates a single interpolated walk, see `generate_walks`."""
+    walks = generate_walks(config, 1, batch)
+    if walks is None:
+        return
+    pos, vel, acc = walks
+    return pos[0], vel[0], acc[0]
+
+def generate_walks(config, n, batch=False, rng=None, return_stats=False):
+    r"""Generates /n/ interpolated walks from the trace in /config/ at once.
+
+    Candidates are drawn as one /(m, k, 2)/ array of noisy traces and
+    interpolated together. Valid walks are kept while the colliding ones
+    are replaced by new candidates, see `rejection_sample`.
+
+    Parameters
+    ----------
+    config : *dict*
+        Configuration of the run, needs at least /x/, /y/, /path/,
+        /method/, /kind/, /factor/, /pre_noise/ and /post_noise/.
+        Optional keys /out_of_bounds/, /segment_check/ and /min_clearance/
+        control the validation, see `walk_validator`. /min_acceptance/
+        sets the floor of the acceptance rate (default 0.01). /noise_mode/
+        selects the pre-noise, see `waypoint_noise`, /float_noise/ and
+        /post_noise_rho/ the post-noise, see `add_post_noise`. If /repair/
+        is set, colliding candidates are first repaired locally, see
+        `repair_walks`. /dt/ is the time between two positions (default
+        1.0), see `compute_kinematics`.
+    n : *int*
+        Number of walks to generate.
+    batch : *boolean*
+        Indicates if the code is running in batch-mode.
+    rng : *numpy.random.Generator*/*TrajectoryStreams*
+        Source of all noise, the global `numpy.random`-state if *None*.
+        With `TrajectoryStreams` of /n/ trajectories every walk only
+        draws from its own streams and can be regenerated on its own, see
+        `regenerate_walk`.
+    return_stats : *bool*
+        If *True* the `SamplingStats` of the run are returned as well.
+
+    Returns
+    -------
+    pos, vel, acc : *array*/*array*/*array*
+        Arrays of shape /(n, L, 2)/, /(n, L-1, 2)/ and /(n, L-2, 2)/
+        containing positions, velocities and accelerations of all walks.
+        *None* if the configuration or the initial trace is invalid.
+
+    Raises
+    ------
+    RejectionSamplingError
+        If the acceptance rate falls below /min_acceptance/.
+
+    """
+    if config["method"] != "Interpolation":
+        print("Invalid Method-Option: ",config["method"])
+        return
+    trace = np.vstack([config["x"], config["y"]]).T.astype(float)
+    worldMap = load_map(config["path"])
+    if not validate_trace(trace[:,0], trace[:,1], worldMap, batch):
+        print("Invalid Initial Trace")
+        return
+    validate = walk_validator(config)
+    streams = isinstance(rng, TrajectoryStreams)
+
+    def draw(slots, attempts):
+        traces = np.broadcast_to(trace, (len(slots),)+trace.shape)
+        noise_rng = rng.streams(slots, attempts) if streams else rng
+        noisy = waypoint_noise(traces, config, noise_rng)
+        smooth = interpolated_walks(noisy, factor=config["factor"], \
+                                    kind=config["kind"])
+        valid, first_collision = validate(smooth)
+        if config.get("repair", False):
+            repair_rng = rng.streams(slots, attempts, REPAIR) if streams \
+                         else rng
+            valid = repair_walks(trace, noisy, smooth, valid, \
+                                 first_collision, config, validate, \
+                                 repair_rng)
+        return smooth, valid
+
+    walks, attempts, stats = rejection_sample(draw, n, \
+                                config.get("min_acceptance", 0.01))
+    if streams:
+        post_rng = rng.streams(np.arange(n), attempts, POST_NOISE)
+    else:
+        post_rng = rng
+    pos = add_post_noise(walks, config, post_rng)
+    kin = compute_kinematics(pos, config.get("dt", 1.0))
+    vel, acc = kin["velocity"], kin["acceleration"]
+    if return_stats:
+        return pos, vel, acc, stats
+    return pos, vel, acc
+
+def repair_walks(trace, noisy, walks, valid, first_collision, config, \
+                 validate, rng=None):
+    r"""Repairs colliding walks by redrawing the noise around the collision.
+
+    For every colliding walk only the waypoints which dominate its first
+    colliding sample are drawn again, /repair_window/ (default 1) of
+    waypoints on each side of the strongest one. The walk is interpolated
+    again and validated from the first sample moved by these waypoints on,
+    since all samples before it are unchanged and known to be valid. This
+    is repeated up to /max_repairs/ (default 3) times. The arrays are
+    updated in place.
+
+    Parameters
+    ----------
+    trace : *array_like*
+        Initial trace of shape /(k, 2)/.
+    noisy : *array*
+        Noisy waypoints of shape /(m, k, 2)/ of the candidates.
+    walks : *array*
+        Interpolated candidates of shape /(m, L, 2)/.
+    valid, first_collision : *array*/*array*
+        Result of /validate/ for /walks/.
+    config : *dict*
+        Configuration of the run, see `generate_walks`.
+    validate : *callable*
+        Validation-function of the walks, see `walk_validator`.
+    rng : *numpy.random.Generator*/*TrajectoryStreams*
+        Source of the new noise with one stream per candidate, the global
+        `numpy.random`-state if *None*.
+
+    Returns
+    -------
+    valid : *array*
+        Validity mask of the repaired candidates.
+
+    """
+    rng = np.random if rng is None else rng
+    valid = np.array(valid, dtype=bool)
+    first_collision = np.array(first_collision)
+    length = noisy.shape[1]
+    width = config.get("repair_window", 1)
+    closed = closed_traces(noisy)
+    for _ in range(config.get("max_repairs", 3)):
+        rows = np.flatnonzero(~valid)
+        if len(rows) == 0:
+            break
+        operators = [interpolation_operator(length, config["factor"], \
+                                            config["kind"], is_closed) \
+                     for is_closed in (False, True)]
+        # Waypoint with the largest weight on the first colliding sample.
+        center = np.empty(len(rows), dtype=np.intp)
+        for is_closed in (False, True):
+            group = closed[rows] == is_closed
+            weights = operators[is_closed][first_collision[rows[group]]]
+            center[group] = np.argmax(np.abs(weights), axis=1)
+        offset = np.arange(length) - center[:,np.newaxis]
+        # Closed traces wrap around, their last waypoint repeats the first.
+        period = np.where(closed[rows], length-1, 2*length)[:,np.newaxis]
+        offset = np.abs((offset + period//2) % period - period//2)
+        window = offset <= width
+
+        row_rng = rng.subset(rows) if isinstance(rng, TrajectoryStreams) \
+                  else rng
+        redrawn = waypoint_noise(np.broadcast_to(trace, (len(rows),) + \
+                                 trace.shape), config, row_rng)
+        noisy[rows] = np.where(window[...,np.newaxis], redrawn, noisy[rows])
+
+        # First sample depending on the redrawn waypoints.
+        start = np.empty(len(rows), dtype=np.intp)
+        for is_closed in (False, True):
+            group = closed[rows] == is_closed
+            moved = np.abs(operators[is_closed]) @ window[group].T.astype(float)
+            start[group] = np.argmax(moved > 0, axis=0)
+        still_closed = closed_traces(noisy[rows])
+        start[still_closed != closed[rows]] = 0
+        closed[rows] = still_closed
+        walks[rows] = interpolated_walks(noisy[rows], \
+                                         factor=config["factor"], \
+                                         kind=config["kind"])
+
+        # Segments ending at the first moved sample are checked as well.
+        offset = max(int(start.min()) - 1, 0)
+        repaired, first = validate(walks[rows, offset:])
+        valid[rows] = repaired
+        first_collision[rows] = np.where(repaired, -1, first + offset)
+    return valid
+
+def regenerate_walk(config, seed, job, index):
+    r"""Regenerates walk /index/ of /job/ from the /seed/ of its run.
+
+    Returns the positions, velocities and accelerations of the single
+    walk, identical to the walk created by `generate_walks` with
+    `TrajectoryStreams` of the same seed and job.
+    """
+    walks = generate_walks(config, 1, batch=True, \
+                           rng=TrajectoryStreams(seed, job, [index]))
+    if walks is None:
+        return
+    pos, vel, acc = walks
+    return pos[0], vel[0], acc[0]
+
+def generate_simulated_walk(config, batch=False, rng=None, \
+                            return_stats=False):
+    r"""Generates /n_total/ simulated walks from the trace in /config/.
+
+    Every round draws a new bundle of trajectories, sized by the
+    acceptance rate so far. Valid trajectories are kept across rounds,
+    see `rejection_sample`.
+
+    Parameters
+    ----------
+    config : *dict*
+        Configuration of the run, see `create_trajectories` and
+        `generate_walks`.
+    batch : *boolean*
+        Indicates if the code is running in batch-mode.
+    rng : *numpy.random.Generator*
+        Source of all random numbers, the global `numpy.random`-state if
+        *None*.
+    return_stats : *bool*
+        If *True* the `SamplingStats` of the run are returned as well.
+
+    Returns
+    -------
+    pos, vel, acc : *array*/*array*/*array*
+        Arrays of shape /(n_total, L, 2)/, /(n_total, L-1, 2)/ and
+        /(n_total, L-2, 2)/. *None* if the initial trace is invalid.
+
+    Raises
+    ------
+    RejectionSamplingError
+        If the acceptance rate falls below /min_acceptance/.
+
+    """
+    x = config["x"][:] #[:] necessary for copying instead of just
+    y = config["y"][:] #referencing the lists
+    worldMap = load_map(config["path"])
+    if not validate_trace(x,y,worldMap, batch):
+        print("Invalid Initial Trace")
+        return
+    validate = walk_validator(config)
+    n_base = config["n_base"]
+    rng = np.random if rng is None else rng
+
+    def draw(slots, attempts):
+        if config.get("noise_mode", "gaussian") == "gaussian":
+            xn, yn = add_simple_noise(x, y, config["pre_noise"], rng)
+        else:
+            trace = np.vstack([x, y]).T[np.newaxis]
+            xn, yn = waypoint_noise(trace, config, rng)[0].T
+        # Whole bundles are drawn, their rows are ordered base by base and
+        # a random subset keeps the candidates independent of the bases.
+        n_bundle = int(np.ceil(len(slots)/n_base))*n_base
+        traj = create_trajectories(xn, yn, dict(config, n_total=n_bundle), \
+                                   rng)
+        traj = traj[rng.permutation(n_bundle)[:len(slots)]]
+        valid, _ = validate(traj)
+        return traj, valid
+
+    traj, _, stats = rejection_sample(draw, config["n_total"], \
+                                      config.get("min_acceptance", 0.01))
+    pos = add_post_noise(traj, config, rng)
+    kin = compute_kinematics(pos, config.get("dt", 1.0))
+    vel, acc = kin["velocity"], kin["acceleration"]
+    if return_stats:
+        return pos, vel, acc, stats
+    return pos, vel, acc
+
+def waypoint_noise(traces, config, rng=None):
+    r"""Adds the pre-noise of /config/ to a batch of traces.
+
+    The optional key /noise_mode/ selects the noise: ‘gaussian’ (default)
+    adds independent gaussian noise, see `add_batch_noise`. ‘truncate’ and
+    ‘project’ keep all waypoints in free space of the map, trading the
+    pure gaussian for far fewer rejected walks at high /pre_noise/, see
+    `add_free_space_noise` for the resulting distributions.
+    """
+    mode = config.get("noise_mode", "gaussian")
+    if mode == "gaussian":
+        return add_batch_noise(traces, config["pre_noise"], rng)
+    nearest = load_nearest_free(config["path"]) if mode == "project" \
+              else None
+    return add_free_space_noise(traces, config["pre_noise"], \
+                                load_map(config["path"]), mode, rng, \
+                                nearest=nearest)
+
+def add_post_noise(walks, config, rng=None):
+    r"""Adds the post-noise of /config/ to /walks/ in place.
+
+    The noise is truncated to whole pixels unless /float_noise/ is set and
+    correlated along the walks by /post_noise_rho/ (default 0.0), see
+    `add_noise`.
+    """
+    return add_noise(walks, config["post_noise"], \
+                     rho=config.get("post_noise_rho", 0.0), rng=rng, \
+                     out=walks, truncate=not config.get("float_noise", False))
+
+def walk_validator(config):
+    r"""Returns the validation-function for the walks of /config/.
+
+    By default only the samples of a walk are checked against the map. If
+    /segment_check/ is set or /min_clearance/ (in pixels) is positive, the
+    segments between the samples are checked against the distance field
+    of the map instead.
+
+    Parameters
+    ----------
+    config : *dict*
+        Configuration of the run, see `generate_walks`.
+
+    Returns
+    -------
+    validate : *callable*
+        Function mapping an /(N, L, 2)/ array of walks to the validity mask
+        and the indices of the first collisions.
+
+    """
+    policy = config.get("out_of_bounds", "reject")
+    clearance = config.get("min_clearance", 0)
+    if config.get("segment_check", False) or clearance > 0:
+        distance = load_distance_field(config["path"])
+        return lambda walks: validate_segments(walks, distance, clearance, \
+                                               policy)
+    worldMap = load_map(config["path"])
+    return lambda walks: validate_traces(walks, worldMap, policy)
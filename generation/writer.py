@@ -0,0 +1,76 @@
+r"""Background-thread writing results while the next ones are generated."""
+import queue
+import threading
+
+# Marks the end of the queue.
+_STOP = object()
+
+class BackgroundWriter(object):
+    r"""Calls /write/ for every queued item on a dedicated thread.
+
+    The queue holds at most /max_pending/ items, so `put` blocks while the
+    writer falls behind and results never pile up in memory. An exception
+    raised by /write/ stops all further writes and is re-raised in the
+    producing thread by the next `put` or by `close`. Items are written in
+    the order they are put.
+
+    Parameters
+    ----------
+    write : *callable*
+        Function called with every item, e.g. writing to an HDF5-file.
+        h5py releases the GIL during I/O and compression, so generation
+        continues meanwhile.
+    max_pending : *int*
+        Maximal number of items waiting to be written. Default is 4.
+
+    """
+    def __init__(self, write, max_pending=4):
+        self.write = write
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self._raised = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Items put before an error of the producer are still written.
+        self.close(raise_error=exc_type is None)
+
+    def put(self, item):
+        r"""Queues /item/, waiting while the queue is full."""
+        while True:
+            self._raise()
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def close(self, raise_error=True):
+        r"""Writes all pending items and stops the thread."""
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        if raise_error:
+            self._raise()
+
+    def _raise(self):
+        if self.error is not None and not self._raised:
+            self._raised = True
+            raise self.error
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            if self.error is not None:
+                # Drain the queue, so the producer is never blocked.
+                continue
+            try:
+                self.write(item)
+            except BaseException as error:
+                self.error = error
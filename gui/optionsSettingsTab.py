@@ -24,6 +24,14 @@ class OptionsSettingsTab(wx.Panel):
         tt_pre = "Standard Deviation of Noise added to Trace-Postitions"
         tx_pre_noise.SetToolTip(tt_pre)
         self.tc_pre_noise = wx.TextCtrl(self)
+        tt_noise_mode = "Gaussian noise, or noise which keeps the "+\
+                        "trace-points in free space by redrawing "+\
+                        "(truncate) or moving them (project)."
+        self.noise_mode_choices = ["gaussian", "truncate", "project"]
+        self.cb_noise_mode = wx.ComboBox(self, \
+                                         choices=self.noise_mode_choices, \
+                                         style=wx.CB_READONLY)
+        self.cb_noise_mode.SetToolTip(tt_noise_mode)
 
         post_noise_label = u'Post-\N{GREEK SMALL LETTER SIGMA}:'
         tx_post_noise = wx.StaticText(self, label=post_noise_label)
@@ -91,6 +99,14 @@ class OptionsSettingsTab(wx.Panel):
         self.cb_sim_covtype = wx.ComboBox(self, choices=self.cov_choices, \
                                      style=wx.CB_READONLY)
 
+        self.tx_sim_sampler = wx.StaticText(self, label="Sampler: ")
+        tt_sampler = "Dense factorization or FFT-based sampling for long"+\
+                     " trajectories."
+        self.tx_sim_sampler.SetToolTip(tt_sampler)
+        self.sampler_choices = ["dense", "fft"]
+        self.cb_sim_sampler = wx.ComboBox(self, \
+                                          choices=self.sampler_choices, \
+                                          style=wx.CB_READONLY)
 
         self.sim_widgets = [#self.tx_sim_title,\
                             self.tx_sim_n, self.tc_sim_n,\
@@ -99,7 +115,8 @@ class OptionsSettingsTab(wx.Panel):
                             self.tx_sim_basepath, self.tc_sim_basepath,\
                             self.tx_sim_ls, self.tc_sim_ls,\
                             self.tx_sim_scale, self.tc_sim_scale,\
-                            self.tx_sim_covtype, self.cb_sim_covtype]
+                            self.tx_sim_covtype, self.cb_sim_covtype,\
+                            self.tx_sim_sampler, self.cb_sim_sampler]
 
         r""" Settings """
         line2 = wx.StaticLine(self)
@@ -107,6 +124,11 @@ class OptionsSettingsTab(wx.Panel):
         self.tc_nr = wx.TextCtrl(self)
         tx_label = wx.StaticText(self, label="Label:")
         self.tc_label = wx.TextCtrl(self)
+        tx_seed = wx.StaticText(self, label="Seed:")
+        tt_seed = "Seed of the walks. Walks of a seed are cached on disk "+\
+                  "and reused, leave empty for new random walks."
+        tx_seed.SetToolTip(tt_seed)
+        self.tc_seed = wx.TextCtrl(self)
 
         self.btn_run = wx.Button(self, label="Run")
         self.Bind(wx.EVT_BUTTON, self.save_defaults, self.btn_run)
@@ -117,6 +139,7 @@ class OptionsSettingsTab(wx.Panel):
         """ Sizer """
         sizer.Add(tx_pre_noise, pos=(0,0), flag=std_flags, border=5)
         sizer.Add(self.tc_pre_noise, pos=(0,1), flag=std_flags, border=5)
+        sizer.Add(self.cb_noise_mode, pos=(0,2), flag=std_flags, border=5)
         sizer.Add(tx_post_noise, pos=(1,0), flag=std_flags, border=5)
         sizer.Add(self.tc_post_noise, pos=(1,1), flag=std_flags, border=5)
         sizer.Add(line1, pos=(2,0), span=(1,3), flag=exp_flags, border=5)
@@ -154,14 +177,19 @@ class OptionsSettingsTab(wx.Panel):
 
         sizer.Add(self.tx_sim_covtype, pos=(13,1), flag=std_flags, border=5)
         sizer.Add(self.cb_sim_covtype, pos=(13,2), flag=std_flags, border=5)
+
+        sizer.Add(self.tx_sim_sampler, pos=(14,1), flag=std_flags, border=5)
+        sizer.Add(self.cb_sim_sampler, pos=(14,2), flag=std_flags, border=5)
         #####
 
-        sizer.Add(line2, pos=(14,0), span=(1,3), flag=exp_flags, border=5)
-        sizer.Add(tx_nr, pos=(15,0), flag=std_flags, border=5)
-        sizer.Add(self.tc_nr, pos=(15,1), flag=std_flags, border=5)
-        sizer.Add(tx_label, pos=(16,0), flag=std_flags, border=5)
-        sizer.Add(self.tc_label, pos=(16,1), flag=std_flags, border=5)
-        sizer.Add(self.btn_run, pos=(15,2), flag=std_flags, border=5)
+        sizer.Add(line2, pos=(15,0), span=(1,3), flag=exp_flags, border=5)
+        sizer.Add(tx_nr, pos=(16,0), flag=std_flags, border=5)
+        sizer.Add(self.tc_nr, pos=(16,1), flag=std_flags, border=5)
+        sizer.Add(tx_label, pos=(17,0), flag=std_flags, border=5)
+        sizer.Add(self.tc_label, pos=(17,1), flag=std_flags, border=5)
+        sizer.Add(tx_seed, pos=(18,0), flag=std_flags, border=5)
+        sizer.Add(self.tc_seed, pos=(18,1), flag=std_flags, border=5)
+        sizer.Add(self.btn_run, pos=(16,2), flag=std_flags, border=5)
 
         outer_box.Add(sizer, 1, wx.ALL, border=10)
         self.SetSizer(outer_box)
@@ -190,6 +218,7 @@ class OptionsSettingsTab(wx.Panel):
         try:
             config["pre_noise"] = float(self.tc_pre_noise.GetValue())
             config["post_noise"] = float(self.tc_post_noise.GetValue())
+            config["noise_mode"] = self.cb_noise_mode.GetStringSelection()
             if self.rb_interp.GetValue():
                 config["method"] = "Interpolation"
                 config["kind"] = self.cb_interp_kind.GetStringSelection()
@@ -207,11 +236,14 @@ class OptionsSettingsTab(wx.Panel):
                 config["length_scale"] = float(self.tc_sim_ls.GetValue())
                 config["scale"] = float(self.tc_sim_scale.GetValue())
                 config["cov_type"] = self.cb_sim_covtype.GetStringSelection()
+                config["sampler"] = self.cb_sim_sampler.GetStringSelection()
             # else:
             #     msg = "Something went terribly wrong...."
             #     raise ValueError(msg)
             config["nr_runs"] = int(self.tc_nr.GetValue())
             config["label"] = self.tc_label.GetValue()
+            seed = self.tc_seed.GetValue().strip()
+            config["seed"] = int(seed) if seed else None
             return config
 
         except:
@@ -223,6 +255,8 @@ class OptionsSettingsTab(wx.Panel):
         config.read(self.config_path)
         self.tc_pre_noise.SetValue(str(config["Defaults"]["pre_noise"]))
         self.tc_post_noise.SetValue(str(config["Defaults"]["post_noise"]))
+        noise_mode = config["Defaults"].get("noise_mode", "gaussian")
+        self.cb_noise_mode.SetSelection(self.noise_mode_choices.index(noise_mode))
         if config["Generation"]["method"] == "Interpolation":
             self.rb_interp.SetValue(True)
             self.rb_sim.SetValue(False)
@@ -241,10 +275,13 @@ class OptionsSettingsTab(wx.Panel):
             self.tc_sim_ls.SetValue(str(config["Generation"]["length_scale"]))
             self.tc_sim_scale.SetValue(str(config["Generation"]["scale"]))
             self.cb_sim_covtype.SetSelection(self.cov_choices.index(config["Generation"]["cov_type"]))
+            sampler = config["Generation"].get("sampler", "dense")
+            self.cb_sim_sampler.SetSelection(self.sampler_choices.index(sampler))
             self.on_choose_sim(None)
 
         self.tc_nr.SetValue(config["Defaults"]["nr_runs"])
         self.tc_label.SetValue(config["Defaults"]["label"])
+        self.tc_seed.SetValue(config["Defaults"].get("seed", ""))
 
 
     def save_defaults(self, evt):
@@ -258,8 +295,11 @@ class OptionsSettingsTab(wx.Panel):
         cp.read(self.config_path)
         cp["Defaults"]["pre_noise"] = str(valid_config["pre_noise"])
         cp["Defaults"]["post_noise"] = str(valid_config["post_noise"])
+        cp["Defaults"]["noise_mode"] = valid_config["noise_mode"]
         cp["Defaults"]["nr_runs"] = str(valid_config["nr_runs"])
         cp["Defaults"]["label"] = valid_config["label"]
+        seed = valid_config["seed"]
+        cp["Defaults"]["seed"] = "" if seed is None else str(seed)
         if valid_config["method"] == "Interpolation":
             cp["Generation"]["method"] = "Interpolation"
             cp["Generation"]["kind"] = valid_config["kind"]
@@ -275,6 +315,7 @@ class OptionsSettingsTab(wx.Panel):
             cp["Generation"]["length_scale"] = str(valid_config["length_scale"])
             cp["Generation"]["scale"] = str(valid_config["scale"])
             cp["Generation"]["cov_type"] = valid_config["cov_type"]
+            cp["Generation"]["sampler"] = valid_config["sampler"]
         with open(self.config_path, "w") as config_file:
             cp.write(config_file)
         evt.Skip()
@@ -75,9 +75,9 @@ class SettingsFrame(wx.Frame):
             return
         config = configparser.ConfigParser()
         config.read(self.config_path)
-        config["Export"] = {"size": self.tc_size.GetValue(), \
-                            "dpi": self.tc_dpi.GetValue(), \
-                            "scale": self.tc_scale.GetValue()}
+        config["Export"].update({"size": self.tc_size.GetValue(), \
+                                 "dpi": self.tc_dpi.GetValue(), \
+                                 "scale": self.tc_scale.GetValue()})
         with open(self.config_path, "w") as config_file:
             config.write(config_file)
         self.Close()
@@ -0,0 +1,103 @@
+r"""Kinematics of batches of walks."""
+import numpy as np
+
+FEATURES = ("speed", "heading", "curvature", "jerk")
+
+def kinematics_shapes(shape, features=()):
+    r"""Returns the shapes of all outputs of `compute_kinematics`.
+
+    Parameters
+    ----------
+    shape : *tuple*
+        Shape /(N, L, 2)/ of the positions.
+    features : *iterable*
+        Names of the derived features, see `FEATURES`.
+
+    Returns
+    -------
+    shapes : *dict*
+        Shape of /velocity/, /acceleration/ and of every feature.
+
+    """
+    unknown = [name for name in features if name not in FEATURES]
+    if unknown:
+        raise ValueError("Invalid kinematic features: "+", ".join(unknown))
+    n, length = shape[:2]
+    steps = {"velocity": 1, "acceleration": 2, "speed": 1, "heading": 1, \
+             "curvature": 2, "jerk": 3}
+    shapes = {}
+    for name in ("velocity", "acceleration") + tuple(features):
+        shapes[name] = (n, max(length-steps[name], 0))
+        if name in ("velocity", "acceleration", "jerk"):
+            shapes[name] += (2,)
+    return shapes
+
+def compute_kinematics(pos, dt=1.0, features=(), out=None):
+    r"""Computes velocity, acceleration and derived features of walks.
+
+    All walks are processed at once by finite differences along the walks.
+    Every result is written directly into its output-array, only the
+    curvature needs a few temporary arrays.
+
+    Parameters
+    ----------
+    pos : *array_like*
+        Array of shape /(N, L, 2)/ containing the positions of /N/ walks.
+    dt : *float*
+        Time between two positions. Default is 1.0, i.e. differences per
+        sample.
+    features : *iterable*
+        Additional features to compute, any of
+
+        - ‘speed’: norm of the velocity, /(N, L-1)/,
+        - ‘heading’: angle of the velocity in radians, /(N, L-1)/,
+        - ‘curvature’: signed curvature at the inner positions, using the
+          mean of the adjoining velocities, /(N, L-2)/. Zero where the
+          walk stands still,
+        - ‘jerk’: derivative of the acceleration, /(N, L-3, 2)/.
+
+    out : *dict*
+        Preallocated arrays of the right shapes (see `kinematics_shapes`)
+        by name. Missing outputs are allocated.
+
+    Returns
+    -------
+    kinematics : *dict*
+        Arrays /velocity/ of shape /(N, L-1, 2)/, /acceleration/ of shape
+        /(N, L-2, 2)/ and the requested /features/.
+
+    """
+    pos = np.asarray(pos, dtype=float)
+    assert (pos.ndim == 3) and (pos.shape[-1] == 2)
+    out = {} if out is None else out
+    result = {}
+    for name, shape in kinematics_shapes(pos.shape, features).items():
+        if out.get(name) is None:
+            result[name] = np.empty(shape)
+        elif out[name].shape != shape:
+            msg = "Output for "+name+" has shape "+str(out[name].shape)+\
+                  ", expected "+str(shape)
+            raise ValueError(msg)
+        else:
+            result[name] = out[name]
+
+    vel = np.subtract(pos[:,1:], pos[:,:-1], out=result["velocity"])
+    np.divide(vel, dt, out=vel)
+    acc = np.subtract(vel[:,1:], vel[:,:-1], out=result["acceleration"])
+    np.divide(acc, dt, out=acc)
+    if "speed" in result:
+        np.hypot(vel[...,0], vel[...,1], out=result["speed"])
+    if "heading" in result:
+        np.arctan2(vel[...,1], vel[...,0], out=result["heading"])
+    if "curvature" in result:
+        mean_vel = vel[:,1:] + vel[:,:-1]
+        mean_vel *= 0.5
+        cross = mean_vel[...,0]*acc[...,1] - mean_vel[...,1]*acc[...,0]
+        norm = np.hypot(mean_vel[...,0], mean_vel[...,1])**3
+        curvature = result["curvature"]
+        curvature[...] = 0
+        np.divide(cross, norm, out=curvature, where=norm > 0)
+    if "jerk" in result:
+        jerk = np.subtract(acc[:,1:], acc[:,:-1], out=result["jerk"])
+        np.divide(jerk, dt, out=jerk)
+    return result
@@ -1,4 +1,6 @@
 import os
+import threading
+from collections import OrderedDict
 from PIL import Image
 import numpy as np
 
@@ -27,8 +29,7 @@ def image2array(path, threshhold=0):
     if not os.path.exists(path):
         raise IOError("Invalid Path: "+path)
     try:
-        worldMap = np.asarray(Image.open(path).convert("L"))
-        worldMap.setflags(write=1)
+        worldMap = np.array(Image.open(path).convert("L"))
         obstacles = np.where(worldMap <= threshhold)
         worldMap[:,:] = 0
         worldMap[obstacles] = 1
@@ -37,6 +38,179 @@ def image2array(path, threshhold=0):
         msg = "Cannot convert image ",path
         raise IOError(msg)
 
+def read_image(path):
+    r"""
+    Reads an image as a color-array for export.
+
+    Parameters
+    ----------
+    path : *str*
+        A (valid)path to an image.
+
+    Returns
+    -------
+    image : *array_like*
+        Array of shape /(height, width, 3)/ with the channels in BGR-order,
+        as written by earlier versions using OpenCV.
+
+    """
+    if not os.path.exists(path):
+        raise IOError("Invalid Path: "+path)
+    return np.array(Image.open(path).convert("RGB"))[:,:,::-1]
+
+def distance_field(worldMap):
+    r"""
+    Computes the euclidean distance of every cell to the nearest obstacle.
+
+    Parameters
+    ----------
+    worldMap : *array_like*
+        Occupancy-Grid from `image2array`.
+
+    Returns
+    -------
+    distance : *array_like*
+        Array of the same shape as /worldMap/ with the distance in pixels
+        from each cell-center to the nearest occupied cell-center. Occupied
+        cells are 0, maps without any obstacle are *inf* everywhere.
+
+    """
+    # scipy.ndimage is slow to import and only needed for distance fields.
+    from scipy.ndimage import distance_transform_edt
+    free = np.asarray(worldMap) == 0
+    if np.all(free):
+        return np.full(free.shape, np.inf, dtype=np.float32)
+    return distance_transform_edt(free).astype(np.float32)
+
+def nearest_free(worldMap):
+    r"""
+    Finds the nearest free cell for every cell of an occupancy-grid.
+
+    Parameters
+    ----------
+    worldMap : *array_like*
+        Occupancy-Grid from `image2array`.
+
+    Returns
+    -------
+    nearest : *array_like*
+        Integer-array of shape /(2,) + worldMap.shape/ with the row and
+        column of the nearest free cell of each cell, so /nearest[:,y,x]/
+        is /(y,x)/ for every free cell, like /worldMap[y][x]/.
+
+    """
+    from scipy.ndimage import distance_transform_edt
+    occupied = np.asarray(worldMap) != 0
+    if np.all(occupied):
+        raise ValueError("Map contains no free space.")
+    nearest = distance_transform_edt(occupied, return_distances=False, \
+                                     return_indices=True)
+    return nearest.astype(np.int32)
+
+
+class MapCache(object):
+    r"""Bounded LRU-cache for occupancy-grids and their derived arrays.
+
+    Maps are keyed by their absolute path, modification time, file size
+    and threshold, so a changed file on disk is decoded again. The cached
+    arrays are read-only and shared between all callers. Least recently
+    used maps are evicted once the cached arrays exceed /max_bytes/.
+
+    Parameters
+    ----------
+    max_bytes : *int*
+        Upper bound for the total size of all cached arrays in bytes.
+        Default is 256 MiB.
+
+    """
+    def __init__(self, max_bytes=256*1024**2):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._arrays = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, threshhold=0):
+        r"""Returns the read-only occupancy-grid of the image at /path/.
+
+        See `image2array` for the parameters.
+        """
+        return self._lookup(path, ("map", threshhold), \
+                            lambda: image2array(path, threshhold))
+
+    def get_distance(self, path, threshhold=0):
+        r"""Returns the read-only distance field of the image at /path/.
+
+        See `distance_field`, the occupancy-grid is taken from the cache.
+        """
+        return self._lookup(path, ("distance", threshhold), \
+                    lambda: distance_field(self.get(path, threshhold)))
+
+    def get_nearest_free(self, path, threshhold=0):
+        r"""Returns the read-only nearest free cells of the image at /path/.
+
+        See `nearest_free`, the occupancy-grid is taken from the cache.
+        """
+        return self._lookup(path, ("nearest", threshhold), \
+                    lambda: nearest_free(self.get(path, threshhold)))
+
+    def _lookup(self, path, tag, build):
+        if not os.path.exists(path):
+            raise IOError("Invalid Path: "+path)
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size) + tag
+        with self._lock:
+            if key in self._arrays:
+                self._arrays.move_to_end(key)
+                self.hits += 1
+                return self._arrays[key]
+            self.misses += 1
+        array = build()
+        array.setflags(write=False)
+        with self._lock:
+            if key not in self._arrays and array.nbytes <= self.max_bytes:
+                self._arrays[key] = array
+                self.nbytes += array.nbytes
+                while self.nbytes > self.max_bytes:
+                    _, evicted = self._arrays.popitem(last=False)
+                    self.nbytes -= evicted.nbytes
+        return array
+
+    def clear(self):
+        r"""Removes all maps from the cache and resets the counters."""
+        with self._lock:
+            self._arrays.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        r"""Returns a *dict* with hits, misses, number of maps and bytes."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, \
+                    "maps": len(self._arrays), "nbytes": self.nbytes, \
+                    "max_bytes": self.max_bytes}
+
+
+map_cache = MapCache()
+
+def load_map(path, threshhold=0):
+    r"""Cached version of `image2array`, returning a read-only array.
+
+    All calls in the process share `map_cache`, so every image is only
+    decoded once as long as it is unchanged on disk.
+    """
+    return map_cache.get(path, threshhold)
+
+def load_distance_field(path, threshhold=0):
+    r"""Cached version of `distance_field` for the image at /path/."""
+    return map_cache.get_distance(path, threshhold)
+
+def load_nearest_free(path, threshhold=0):
+    r"""Cached version of `nearest_free` for the image at /path/."""
+    return map_cache.get_nearest_free(path, threshhold)
+
 
 if __name__ == "__main__":
     from matplotlib import pyplot as plt
@@ -1,6 +1,151 @@
+"""Noise for batches of traces.
+
+All noise is added to float-arrays of shape /(N, L, 2)/, i.e. /N/ traces
+of /L/ points each, and stays float unless truncation is requested. The
+list-based functions `add_simple_noise` and `add_complex_noise` are kept
+for single traces.
+"""
+from functools import lru_cache
 import numpy as np
 
-def add_simple_noise(trace_x, trace_y, noise):
+from randomStreams import TrajectoryStreams
+
+def add_noise(traces, scale=1.0, cov=None, rho=0.0, rng=None, out=None, \
+              truncate=False):
+    """Adds gaussian noise to a batch of traces.
+
+    The noise of every point is isotropic with standard deviation /scale/
+    or follows the 2x2 covariance /cov/. With /rho/ the noise along each
+    trace is an AR(1)-process, e_t = rho*e_(t-1) + sqrt(1-rho^2)*w_t,
+    started in its stationary distribution, so every point keeps the same
+    marginal distribution while consecutive points are correlated by
+    /rho/.
+
+    Parameters
+    ----------
+    traces : *array_like*
+        Array of shape /(N, L, 2)/ containing /N/ traces of length /L/.
+    scale : *float*
+        Standard deviation of isotropic noise. Default is 1.0.
+    cov : *2x2-array*
+        Covariance matrix of the noise of a single point, replaces
+        /scale/. It must be symmetric and positive-semidefinite, see
+        `noise_factor`.
+    rho : *float*
+        Correlation of consecutive points, in (-1, 1). Default is 0.0.
+    rng : *numpy.random.Generator*
+        Source of the noise, the global `numpy.random`-state if *None*.
+    out : *array*
+        Float-array of shape /(N, L, 2)/ receiving the result, may be
+        /traces/ itself to add the noise in place.
+    truncate : *bool*
+        If *True* the noise is truncated towards zero to whole pixels, as
+        done by the list-based functions. Default is *False*.
+
+    Returns
+    -------
+    noisy : *array*
+        Array of shape /(N, L, 2)/ containing the noisy traces, /out/ if
+        given.
+
+    """
+    traces = np.asarray(traces, dtype=float)
+    assert (traces.ndim == 3) and (traces.shape[-1] == 2) and \
+        (traces.shape[1] > 0)
+    rng = np.random if rng is None else rng
+    if cov is None:
+        noise = rng.normal(0, scale, traces.shape)
+    else:
+        noise = rng.standard_normal(traces.shape)
+    if rho != 0:
+        noise = ar1_filter(noise, rho)
+    if cov is not None:
+        noise = np.matmul(noise, noise_factor(cov).T)
+    if truncate:
+        np.trunc(noise, out=noise)
+    if out is None:
+        return traces + noise
+    return np.add(traces, noise, out=out)
+
+
+def ar1_filter(white, rho):
+    """Turns white noise into a stationary AR(1)-process along axis 1.
+
+    Parameters
+    ----------
+    white : *array_like*
+        Array of shape /(N, L, ...)/ of independent noise.
+    rho : *float*
+        Correlation of consecutive points, in (-1, 1).
+
+    Returns
+    -------
+    correlated : *array*
+        Array of the same shape and marginal distribution as /white/.
+
+    """
+    # scipy.signal is slow to import and only needed here.
+    from scipy.signal import lfilter
+    if not -1 < rho < 1:
+        raise ValueError("Invalid correlation rho: "+str(rho))
+    white = np.array(white, dtype=float)
+    gain = np.sqrt(1 - rho**2)
+    # Starting with e_0 = w_0 keeps the process stationary.
+    white[:,0] /= gain
+    return lfilter([gain], [1, -rho], white, axis=1)
+
+
+def noise_factor(cov):
+    """Returns the cached factor /F/ of the 2x2 covariance /cov/ = /F F^T/.
+
+    The Cholesky factor is used for positive definite matrices, singular
+    positive-semidefinite matrices fall back to the square root of their
+    eigendecomposition. The matrix is checked only once per value.
+    """
+    return _noise_factor(tuple(np.asarray(cov, dtype=float).ravel()))
+
+@lru_cache(maxsize=32)
+def _noise_factor(cov):
+    cov = np.array(cov).reshape(2, 2)
+    if not np.allclose(cov, cov.T):
+        raise ValueError("Covariance matrix is not symmetric: "+str(cov))
+    try:
+        factor = np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        values, vectors = np.linalg.eigh(cov)
+        if np.any(values < -1e-12*max(1.0, np.abs(values).max())):
+            msg = "Covariance matrix is not positive-semidefinite: "+str(cov)
+            raise ValueError(msg)
+        factor = vectors*np.sqrt(np.clip(values, 0, None))
+    factor.setflags(write=False)
+    return factor
+
+
+def add_batch_noise(traces, noise, rng=None):
+    """Adds independent noise of whole pixels to a batch of traces.
+
+    Same as `add_noise` with /truncate/ set, kept for the pre- and
+    post-noise of the generators.
+
+    Parameters
+    ----------
+    traces : *array_like*
+        Array of shape /(N, L, 2)/ containing /N/ traces of length /L/.
+    noise : *float*
+        Standard deviation of the gaussion noise.
+    rng : *numpy.random.Generator*
+        Source of the noise, the global `numpy.random`-state if *None*.
+
+    Returns
+    -------
+    noisy : *array*
+        Array of shape /(N, L, 2)/ containing the noisy traces.
+
+    """
+    return add_noise(traces, noise, rng=rng, truncate=True)
+
+
+def add_simple_noise(trace_x, trace_y, noise, rng=None):
     """Adds independent noise to traces.
 
     Parameters
@@ -9,6 +154,8 @@ def add_simple_noise(trace_x, trace_y, noise):
         Lists containing the individual values of the trace.
     noise : *float*
         Standard deviation of the gaussion noise.
+    rng : *numpy.random.Generator*
+        Source of the noise, the global `numpy.random`-state if *None*.
 
     Returns
     -------
@@ -19,22 +166,112 @@ def add_simple_noise(trace_x, trace_y, noise):
     assert (len(trace_x) > 0) and \
         (len(trace_y) > 0) and \
         (len(trace_x) == len(trace_y))
-    if isinstance(trace_x, list):
-        xn = (trace_x + np.random.normal(0, noise, \
-                                         len(trace_x)).astype(int)).tolist()
-        yn = (trace_y + np.random.normal(0, noise, \
-                                         len(trace_y)).astype(int)).tolist()
-    elif isinstance(trace_x, np.ndarray):
-        xn = (trace_x + np.random.normal(0, noise, \
-                                         trace_x.shape).astype(int)).tolist()
-        yn = (trace_y + np.random.normal(0, noise, \
-                                         trace_y.shape).astype(int)).tolist()
-    else:
+    if not isinstance(trace_x, (list, np.ndarray)):
         raise TypeError("Invalid trace-types:",type(trace_x),",",type(trace_y))
-    return xn, yn
-    
+    rng = np.random if rng is None else rng
+    # All x-values are drawn before the y-values.
+    trace = np.array([trace_x, trace_y]).T
+    noise = rng.normal(0, noise, (2, len(trace_x))).astype(int).T
+    xn, yn = (trace + noise).T
+    return xn.tolist(), yn.tolist()
+
+
+def add_free_space_noise(traces, noise, worldMap, mode="truncate", rng=None, \
+                         max_tries=32, nearest=None):
+    """Adds noise to a batch of traces, keeping all waypoints in free space.
+
+    Every waypoint is perturbed like in `add_batch_noise`. Waypoints which
+    end up in an occupied cell or outside of /worldMap/ are then treated
+    depending on /mode/:
+
+    - ‘truncate’: The noise of these waypoints is drawn again, up to
+      /max_tries/ times. Each waypoint thus follows the truncated gaussian,
+      i.e. the gaussian conditioned on landing in a free cell, independent
+      of all other waypoints. Waypoints without a free draw after
+      /max_tries/ keep their unperturbed position, which only matters if
+      less than a few percent of the gaussian's mass is free.
+    - ‘project’: The waypoints are moved to the nearest free cell (after
+      clipping to the map). The gaussian is kept in free space, but the
+      mass falling on obstacles is piled up along their borders.
+
+    Waypoints already in free space keep their first draw in both modes,
+    so the result only differs from `add_batch_noise` where the latter
+    produced occupied waypoints. The segments between the waypoints can
+    still cross obstacles, so the walks have to be validated anyway.
+
+    Parameters
+    ----------
+    traces : *array_like*
+        Array of shape /(N, L, 2)/ containing /N/ traces of length /L/.
+        The unperturbed waypoints are expected to lie in free space.
+    noise : *float*
+        Standard deviation of the gaussion noise.
+    worldMap : *array_like*
+        Occupancy-Grid from `mapCreation.image2array`.
+    mode : *str*
+        ‘truncate’ or ‘project’, see above. Default is ‘truncate’.
+    rng : *numpy.random.Generator*
+        Source of the noise, the global `numpy.random`-state if *None*.
+        Redraws only draw for the traces with blocked waypoints, so with
+        `TrajectoryStreams` every trace only depends on its own stream.
+    max_tries : *int*
+        Maximal number of redraws in mode ‘truncate’. Default is 32.
+    nearest : *array_like*
+        Nearest free cells from `mapCreation.nearest_free`, computed from
+        /worldMap/ if *None*. Only used in mode ‘project’.
+
+    Returns
+    -------
+    noisy : *array*
+        Array of shape /(N, L, 2)/ containing the noisy traces.
+
+    """
+    if mode not in ("truncate", "project"):
+        raise ValueError("Invalid noise-mode: "+str(mode))
+    traces = np.asarray(traces, dtype=float)
+    assert (traces.ndim == 3) and (traces.shape[-1] == 2) and \
+        (traces.shape[1] > 0)
+    rng = np.random if rng is None else rng
+    worldMap = np.asarray(worldMap)
+    noisy = add_noise(traces, noise, rng=rng, truncate=True)
+    blocked = _occupied(noisy, worldMap)
+    if mode == "truncate":
+        for _ in range(max_tries):
+            # Only traces with blocked waypoints draw again.
+            rows = np.flatnonzero(np.any(blocked, axis=1))
+            if len(rows) == 0:
+                break
+            row_rng = rng.subset(rows) if isinstance(rng, TrajectoryStreams) \
+                      else rng
+            redrawn = add_noise(traces[rows], noise, rng=row_rng, \
+                                truncate=True)
+            noisy[rows] = np.where(blocked[rows][...,np.newaxis], redrawn, \
+                                   noisy[rows])
+            blocked[rows] &= _occupied(noisy[rows], worldMap)
+        noisy[blocked] = traces[blocked]
+    elif np.any(blocked):
+        if nearest is None:
+            from mapCreation import nearest_free
+            nearest = nearest_free(worldMap)
+        # Waypoints are (x, y), the map is indexed by [y, x].
+        upper = np.array(worldMap.shape[::-1]) - 1
+        cells = np.clip(np.floor(noisy[blocked]), 0, upper).astype(np.intp)
+        noisy[blocked] = np.stack([nearest[1][cells[:,1], cells[:,0]], \
+                                   nearest[0][cells[:,1], cells[:,0]]], \
+                                  axis=-1)
+    return noisy
+
+
+def _occupied(points, worldMap):
+    # Points (x, y) in occupied cells or outside of the map [y, x].
+    cells = np.floor(points).astype(np.intp)
+    inside = np.all((cells >= 0) & (cells < worldMap.shape[::-1]), axis=-1)
+    blocked = ~inside
+    blocked[inside] = worldMap[cells[inside][:,1], cells[inside][:,0]] != 0
+    return blocked
+
 
-def add_complex_noise(trace_x, trace_y, cov):
+def add_complex_noise(trace_x, trace_y, cov, rng=None):
     """Adds noise from multivariate gaussian to traces.
 
     TODO: Add Gui-Option for Covariance.
@@ -46,6 +283,8 @@ def add_complex_noise(trace_x, trace_y, cov):
     cov : *2x2-array*
         Covariance matrix of the distribution. It must be symmetric and
         positive-semidefinite for proper sampling.
+    rng : *numpy.random.Generator*
+        Source of the noise, the global `numpy.random`-state if *None*.
 
     Returns
     -------
@@ -53,8 +292,7 @@ def add_complex_noise(trace_x, trace_y, cov):
         Lists containing the noisy trace-data.
     """
     assert (len(trace_x) > 0) and (len(trace_y) > 0) and (len(trace_x) == len(trace_y))
-    assert np.all(np.linalg.eigvals(cov) >= 0)
-    xn, yn = np.random.multivariate_normal([0,0], cov, len(trace_x)).T
-    xn = (trace_x + xn).astype(int).tolist()
-    yn = (trace_y + yn).astype(int).tolist()
-    return xn, yn
+    trace = np.vstack([trace_x, trace_y]).T[np.newaxis]
+    noisy = add_noise(trace, cov=cov, rng=rng, truncate=True)
+    xn, yn = noisy[0].T.astype(int)
+    return xn.tolist(), yn.tolist()
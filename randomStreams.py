@@ -0,0 +1,122 @@
+r"""Counter-based random streams for reproducible trajectories.
+
+Every trajectory gets its own `numpy.random.Philox`-streams, keyed by the
+seed of the run and positioned by a counter built from the job (e.g. the
+line of a batch-file), the index of the trajectory in that job, the
+attempt of drawing it and the stage of the generation. Any single
+trajectory can therefore be regenerated from (seed, job, index) alone, no
+matter in which batch or process it was created originally.
+"""
+import numpy as np
+
+def stream_key(seed):
+    r"""Derives the 128-bit Philox-key from an integer /seed/."""
+    return np.random.SeedSequence(seed).generate_state(2, np.uint64)
+
+PRE_NOISE = 0
+POST_NOISE = 1
+REPAIR = 2
+
+def trajectory_rng(seed, job, index, attempt=0, stage=PRE_NOISE):
+    r"""Returns the random generator of trajectory /index/ of /job/.
+
+    Parameters
+    ----------
+    seed : *int*
+        Seed of the run.
+    job, index : *int*/*int*
+        Job and index of the trajectory. They are placed in the upper
+        words of the 256-bit Philox-counter.
+    attempt : *int*
+        Attempt of drawing the trajectory, placed in the second word.
+    stage : *int*
+        Stage of the generation, e.g. `PRE_NOISE`, `POST_NOISE` or
+        `REPAIR`. It selects a quarter of the lowest word, so every stage
+        can draw 2^62 blocks before running into the next one.
+
+    Returns
+    -------
+    rng : *numpy.random.Generator*
+        Generator positioned at the start of the trajectory's stream.
+
+    """
+    counter = [stage << 62, attempt, index, job]
+    return np.random.Generator(np.random.Philox(key=stream_key(seed), \
+                                                counter=counter))
+
+class TrajectoryStreams(object):
+    r"""Batch of per-trajectory streams acting like a single generator.
+
+    Supports the subset of the `numpy.random.Generator`-interface used by
+    the generation-code. The first axis of every requested /size/ runs
+    over the trajectories and row /i/ is drawn from the stream of
+    trajectory /indices[i]/ only.
+
+    Parameters
+    ----------
+    seed : *int*
+        Seed of the run.
+    job : *int*
+        Job of all trajectories in the batch.
+    indices : *array_like*
+        Indices of the trajectories in the job.
+    attempts : *array_like*
+        Attempt for each trajectory, 0 for all if *None*.
+    stage : *int*
+        Stage of the generation, see `trajectory_rng`.
+
+    """
+    def __init__(self, seed, job, indices, attempts=None, \
+                 stage=PRE_NOISE, rngs=None):
+        self.seed = seed
+        self.job = job
+        self.stage = stage
+        self.indices = np.asarray(indices, dtype=np.int64)
+        if attempts is None:
+            attempts = np.zeros(len(self.indices), dtype=np.int64)
+        self.attempts = np.asarray(attempts, dtype=np.int64)
+        if rngs is None:
+            rngs = [trajectory_rng(seed, job, int(index), int(attempt), \
+                                   stage) \
+                    for index, attempt in zip(self.indices, self.attempts)]
+        self.rngs = rngs
+
+    def __len__(self):
+        return len(self.rngs)
+
+    def subset(self, rows):
+        r"""Returns the streams of the trajectories in /rows/.
+
+        The generators are shared, so drawing from the subset advances
+        the streams of this object as well.
+        """
+        rows = np.arange(len(self))[rows]
+        return TrajectoryStreams(self.seed, self.job, self.indices[rows], \
+                                 self.attempts[rows], self.stage, \
+                                 [self.rngs[row] for row in rows])
+
+    def streams(self, rows, attempts, stage=PRE_NOISE):
+        r"""Returns fresh streams for /attempts/ of the trajectories in /rows/.
+        """
+        return TrajectoryStreams(self.seed, self.job, self.indices[rows], \
+                                 attempts, stage)
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        return self._draw("normal", size, loc, scale)
+
+    def standard_normal(self, size=None):
+        return self._draw("standard_normal", size)
+
+    def uniform(self, low=0.0, high=1.0, size=None):
+        return self._draw("uniform", size, low, high)
+
+    def _draw(self, method, size, *args):
+        size = tuple(np.atleast_1d(size))
+        if size[0] != len(self):
+            msg = "First dimension "+str(size[0])+" does not match the "+\
+                  "number of streams: "+str(len(self))
+            raise ValueError(msg)
+        out = np.empty(size)
+        for row, rng in enumerate(self.rngs):
+            out[row] = getattr(rng, method)(*args, size=size[1:])
+        return out
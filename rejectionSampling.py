@@ -0,0 +1,130 @@
+r"""Adaptive rejection sampling of walks, shared by all generation-methods."""
+import numpy as np
+
+class RejectionSamplingError(RuntimeError):
+    r"""Raised when too few candidates pass the validation."""
+    pass
+
+class SamplingStats(object):
+    r"""Summary of a `rejection_sample`-run.
+
+    Parameters
+    ----------
+    requested : *int*
+        Number of requested samples.
+    drawn : *int*
+        Number of drawn candidates.
+    valid : *int*
+        Number of valid candidates, including those not needed anymore.
+    rounds : *int*
+        Number of calls to the draw-function.
+
+    """
+    def __init__(self, requested=0, drawn=0, valid=0, rounds=0):
+        self.requested = requested
+        self.drawn = drawn
+        self.valid = valid
+        self.rounds = rounds
+
+    @property
+    def acceptance_rate(self):
+        return self.valid/self.drawn if self.drawn else 0.0
+
+    @property
+    def wasted(self):
+        r"""Number of drawn candidates which did not end up as a sample."""
+        return self.drawn - self.requested
+
+    def __add__(self, other):
+        return SamplingStats(self.requested+other.requested, \
+                             self.drawn+other.drawn, \
+                             self.valid+other.valid, \
+                             self.rounds+other.rounds)
+
+    def __repr__(self):
+        return "SamplingStats(requested="+str(self.requested)+\
+               ", drawn="+str(self.drawn)+", acceptance_rate="+\
+               "{:.3f}".format(self.acceptance_rate)+", wasted="+\
+               str(self.wasted)+")"
+
+def rejection_sample(draw, n, min_acceptance=0.01, min_candidates=100, \
+                     max_per_slot=64):
+    r"""Draws candidates until each of /n/ slots holds a valid one.
+
+    Valid candidates are kept between rounds. In every round each pending
+    slot gets as many candidates as one valid candidate needs on average
+    given the acceptance rate observed so far, so most slots are filled
+    in the next round without redrawing whole batches. The candidates
+    of a slot are numbered by attempt and a slot always takes its first
+    valid attempt, which makes the result independent of the round sizes
+    as long as /draw/ only depends on slot and attempt.
+
+    Parameters
+    ----------
+    draw : *callable*
+        Function /draw(slots, attempts)/ returning an array of candidates
+        with one row for each entry of the integer arrays /slots/ and
+        /attempts/, and the boolean validity mask of these candidates.
+    n : *int*
+        Number of requested samples.
+    min_acceptance : *float*
+        Floor of the acceptance rate. Once at least /min_candidates/ were
+        drawn and the observed rate falls below it, sampling stops with
+        a `RejectionSamplingError`. Default is 0.01.
+    min_candidates : *int*
+        Number of candidates drawn before the acceptance rate is trusted.
+        Default is 100.
+    max_per_slot : *int*
+        Upper bound of candidates per slot and round. Default is 64.
+
+    Returns
+    -------
+    samples : *array*
+        Array with the accepted candidate of every slot.
+    attempts : *array*
+        Attempt of the accepted candidate of every slot.
+    stats : *SamplingStats*
+        Acceptance rate and number of wasted candidates of the run.
+
+    """
+    samples = None
+    next_attempt = np.zeros(n, dtype=np.int64)
+    attempts = np.full(n, -1, dtype=np.int64)
+    pending = np.arange(n)
+    stats = SamplingStats(requested=n)
+    while len(pending) > 0:
+        rate = stats.acceptance_rate if stats.drawn else 1.0
+        per_slot = int(min(max_per_slot, \
+                           np.ceil(1/max(rate, min_acceptance))))
+        if stats.drawn < min_candidates:
+            # Check the floor as soon as the rate can be trusted.
+            needed = np.ceil((min_candidates-stats.drawn)/len(pending))
+            per_slot = int(min(per_slot, max(needed, 1)))
+        slots = np.repeat(pending, per_slot)
+        tries = np.repeat(next_attempt[pending], per_slot) + \
+                np.tile(np.arange(per_slot), len(pending))
+        candidates, valid = draw(slots, tries)
+        next_attempt[pending] += per_slot
+        stats.drawn += len(slots)
+        stats.valid += int(np.count_nonzero(valid))
+        stats.rounds += 1
+
+        valid = np.asarray(valid).reshape(len(pending), per_slot)
+        hit = np.any(valid, axis=1)
+        take = np.flatnonzero(hit)*per_slot + np.argmax(valid[hit], axis=1)
+        if samples is None:
+            samples = np.empty((n,)+candidates.shape[1:], \
+                               dtype=candidates.dtype)
+        samples[pending[hit]] = candidates[take]
+        attempts[pending[hit]] = tries[take]
+        pending = pending[~hit]
+
+        if len(pending) > 0 and stats.drawn >= min_candidates and \
+           stats.acceptance_rate < min_acceptance:
+            msg = "Acceptance rate "+\
+                  "{:.2%}".format(stats.acceptance_rate)+" after "+\
+                  str(stats.drawn)+" candidates is below the floor of "+\
+                  "{:.2%}".format(min_acceptance)+". Maybe modify the "+\
+                  "trace-points or reduce noise to create valid walks."
+            raise RejectionSamplingError(msg)
+    return samples, attempts, stats
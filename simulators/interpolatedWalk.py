@@ -1,6 +1,5 @@
+from functools import lru_cache
 import numpy as np
-from scipy.interpolate import interp1d
-from scipy.interpolate import InterpolatedUnivariateSpline
 
 def interpolated_walk(x, y, factor=10, kind="cubic"):
     r""" Smooths a given trace by interpolation to give it a more natural appearance.
@@ -19,7 +18,7 @@ def interpolated_walk(x, y, factor=10, kind="cubic"):
         ‘cubic’ and ‘univariate’ where ‘zero’, ‘slinear’,
         ‘quadratic’ and ‘cubic’ refer to a spline interpolation
         of zeroth, first, second or third order). If ‘univariate’ is
-        chose, the function
+        chose, an interpolating spline of third order equivalent to
         `scipy.interpolate.InterpolatedUnivariateSpline` will be
         used. Default is ‘cubic’.
 
@@ -29,22 +28,148 @@ def interpolated_walk(x, y, factor=10, kind="cubic"):
         Lists of smoothed Trace-Positions. Now no longer as /integers/.
 
     """
-    original_len = len(x)
+    trace = np.vstack([x, y]).T[np.newaxis]
+    xi, yi = interpolated_walks(trace, factor=factor, kind=kind)[0].T
+    return xi, yi
+
+def interpolated_walks(traces, factor=10, kind="cubic"):
+    r""" Smooths a batch of traces by interpolation.
+
+    All traces are interpolated together with one matrix-product per
+    closed-loop and open group, see `interpolation_operator`.
+
+    Parameters
+    ----------
+    traces : *array_like*
+        Array of shape /(N, L, 2)/ containing /N/ traces of length /L/.
+    factor : *int*
+        Factor which determines the number of points of the smoother traces
+        (/Factor * L/). Default is 10.
+    kind : *str*
+        Kind of interpolation, see `interpolated_walk`. Default is ‘cubic’.
+
+    Returns
+    -------
+    walks : *array*
+        Array of shape /(N, int(Factor * L), 2)/ of smoothed Trace-Positions.
+
+    """
+    traces = np.asarray(traces, dtype=float)
+    original_len = traces.shape[1]
+    new_len = int(factor*original_len)
+    if kind == "linear":
+        # Padding for closed-loop traces does not change linear segments.
+        return resample_linear(traces, new_len)
+    walks = np.empty((traces.shape[0], new_len, 2))
     # Padding necessary for closed-loop traces.
-    if np.sqrt((x[-1]-x[0])**2+(y[-1]-y[0])**2) < 10:
-        xpad = np.concatenate((x[-3:-1],x,x[1:3]))
-        ypad = np.concatenate((y[-3:-1],y,y[1:3]))
-        ti = np.linspace(2, original_len+1, int(factor*original_len))
+    closed = closed_traces(traces)
+    for is_closed in (True, False):
+        if np.any(closed == is_closed):
+            operator = interpolation_operator(original_len, factor, kind, \
+                                              is_closed)
+            walks[closed == is_closed] = np.matmul(operator, \
+                                                   traces[closed == is_closed])
+    return walks
+
+def closed_traces(traces):
+    r"""Boolean mask of the traces in /traces/ which form a closed loop.
+
+    A trace counts as closed if its first and last waypoint are less than
+    10 pixels apart.
+    """
+    traces = np.asarray(traces, dtype=float)
+    return np.linalg.norm(traces[:,-1]-traces[:,0], axis=-1) < 10
+
+@lru_cache(maxsize=64)
+def interpolation_operator(length, factor, kind, closed):
+    r""" Interpolation of a trace as a matrix acting on its waypoints.
+
+    All supported kinds of interpolation are linear in the data, so for a
+    fixed trace-length the smoothed trace is one fixed matrix times the
+    (noisy) waypoints. The matrix is built once per set of arguments by
+    interpolating the unit vectors, including the padding of closed-loop
+    traces, and cached afterwards.
+
+    Parameters
+    ----------
+    length : *int*
+        Number of waypoints of the trace.
+    factor : *int*
+        Factor which determines the number of points of the smoother trace.
+    kind : *str*
+        Kind of interpolation, see `interpolated_walk`.
+    closed : *bool*
+        *True* for closed-loop traces, which are padded periodically.
+
+    Returns
+    -------
+    operator : *array*
+        Read-only array of shape /(int(factor*length), length)/.
+
+    """
+    # scipy.interpolate is slow to import and only needed once per operator.
+    from scipy.interpolate import interp1d, make_interp_spline
+    new_len = int(factor*length)
+    unit = np.eye(length)
+    if closed:
+        unit = np.concatenate((unit[-3:-1], unit, unit[1:3]))
+        ti = np.linspace(2, length+1, new_len)
     else:
-        xpad = x
-        ypad = y
-        ti = np.linspace(0, original_len-1, factor*original_len)
-    t = np.arange(len(xpad))
+        ti = np.linspace(0, length-1, new_len)
+    t = np.arange(unit.shape[0])
     if kind == "univariate":
-        xi = InterpolatedUnivariateSpline(t, xpad)(ti)
-        yi = InterpolatedUnivariateSpline(t, ypad)(ti)
+        operator = make_interp_spline(t, unit, k=3, axis=0)(ti)
     else:
-        xi = interp1d(t, xpad, kind=kind)(ti)
-        yi = interp1d(t, ypad, kind=kind)(ti)
-    return xi, yi
+        operator = interp1d(t, unit, kind=kind, axis=0)(ti)
+    operator.setflags(write=False)
+    return operator
+
+def resample_linear(paths, n_out, arc_length=False):
+    r""" Linearly resamples a batch of paths to /n_out/ points each.
 
+    All paths and both coordinates are resampled in one vectorized pass.
+
+    Parameters
+    ----------
+    paths : *array_like*
+        Array of shape /(N, L, 2)/ containing /N/ paths of length /L/ >= 2.
+    n_out : *int*
+        Number of points of the resampled paths.
+    arc_length : *bool*
+        If *True* the new points are spaced evenly along the arc-length of
+        each path (constant speed), otherwise evenly in the index of the
+        original points. Default is *False*.
+
+    Returns
+    -------
+    resampled : *array*
+        Array of shape /(N, n_out, 2)/ of the resampled paths.
+
+    """
+    paths = np.asarray(paths, dtype=float)
+    n, length = paths.shape[:2]
+    assert length >= 2
+    rows = np.arange(n)[:,np.newaxis]
+    target = np.linspace(0, length-1, n_out)
+    if arc_length:
+        steps = np.linalg.norm(np.diff(paths, axis=1), axis=-1)
+        dist = np.concatenate((np.zeros((n,1)), np.cumsum(steps, axis=1)), \
+                              axis=1)
+        total = dist[:,-1:]
+        # Paths without any length keep the spacing of their indices.
+        param = np.where(total > 0, \
+                         dist/np.where(total > 0, total, 1)*(length-1), \
+                         np.arange(length))
+        # Shift every row into its own interval for a single searchsorted.
+        idx = np.searchsorted((param + rows*length).ravel(), \
+                              (target + rows*length).ravel(), side="right")
+        idx = np.clip(idx.reshape(n, n_out) - 1 - rows*length, 0, length-2)
+        low = param[rows, idx]
+        width = param[rows, idx+1] - low
+        frac = np.where(width > 0, (target - low)/np.where(width > 0, \
+                        width, 1), 0)
+    else:
+        idx = np.clip(np.floor(target).astype(np.intp), 0, length-2)
+        frac = np.broadcast_to(target - idx, (n, n_out))
+    start = paths[rows, idx]
+    return start + frac[...,np.newaxis]*(paths[rows, idx+1] - start)
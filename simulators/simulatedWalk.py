@@ -1,9 +1,8 @@
 import sys
+from functools import lru_cache
 import numpy as np
-from scipy.interpolate import interp1d
-from matplotlib import pyplot as plt
 
-from sklearn.gaussian_process.kernels import RBF, Matern
+from simulators.interpolatedWalk import resample_linear
 
 #def get_xangle(u,deg=None):
 #    v = np.array([1,0])
@@ -26,38 +25,48 @@ def angle_clockwise(A, B):
     else: # if the det > 0 then A is immediately clockwise of B
         return 2*np.pi-inner_angle
 
+def rotation_angles(current, previous):
+    r"""Vectorized version of /angle_clockwise(current, previous)+pi/2/.
+
+    Parameters
+    ----------
+    current, previous : *array_like*
+        Arrays of shape /(..., 2)/ with the points to compare.
+
+    Returns
+    -------
+    theta : *array_like*
+        Array of shape /(...)/ with the rotation-angles.
+
+    """
+    det = current[...,0]*previous[...,1] - current[...,1]*previous[...,0]
+    dot = np.sum(current*previous, axis=-1)
+    return np.mod(-np.arctan2(det, dot), 2*np.pi) + 0.5*np.pi
+
 def create_bases(mean, n_base, len_base, var_base, base_type, \
-                 plot=False):
-    base = np.zeros((n_base, len_base, 2))
-    base[:,0,:] = mean[0]
-    mean_indices = [int(el) for el in np.linspace(1,len(mean)-1,len_base)]
-    var_indices = [int(el) for el in np.linspace(1,len(var_base)-1,len_base)]
-
-    for i in range(len_base):
-        i_mean = mean_indices[i]
-        i_var = var_indices[i]
-
-        theta = angle_clockwise(mean[i_mean],mean[i_mean-1])+0.5*np.pi
-        Phi = np.array([[np.cos(theta), -np.sin(theta)],\
-                        [np.sin(theta), np.cos(theta)]])
-
-        line = np.zeros((n_base,2))
-        if base_type == "Linear":
-            line[:,0] = np.linspace(-var_base[i_var],var_base[i_var],n_base)
-        elif base_type ==  "Normal":
-            line[:,0] = np.sort(np.random.normal(0, var_base[i_var], \
-                                                 n_base))
-        elif base_type ==  "Uniform":
-            line[:,0] = np.sort(np.random.uniform(-var_base[i_var], \
-                                            var_base[i_var], n_base))
-        else:
-            print("Invalid base_type: ",base_type)
-            sys.exit()
-
-        rot = mean[i_mean] + np.matmul(Phi,line.T).T
-        base[:,i,0] = rot[:,0]
-        base[:,i,1] = rot[:,1]
+                 plot=False, rng=None):
+    rng = np.random if rng is None else rng
+    mean_indices = np.linspace(1,len(mean)-1,len_base).astype(int)
+    var_indices = np.linspace(1,len(var_base)-1,len_base).astype(int)
+    var = np.asarray(var_base)[var_indices][:,np.newaxis]
+
+    if base_type == "Linear":
+        lines = np.linspace(-var[:,0], var[:,0], n_base, axis=1)
+    elif base_type ==  "Normal":
+        lines = np.sort(rng.normal(0, var, (len_base, n_base)), \
+                        axis=1)
+    elif base_type ==  "Uniform":
+        lines = np.sort(rng.uniform(-var, var, (len_base, n_base)), \
+                        axis=1)
+    else:
+        print("Invalid base_type: ",base_type)
+        sys.exit()
+
+    theta = rotation_angles(mean[mean_indices], mean[mean_indices-1])
+    direction = np.stack([np.cos(theta), np.sin(theta)], axis=-1)
+    base = mean[mean_indices] + lines.T[:,:,np.newaxis]*direction
     if plot:
+        from matplotlib import pyplot as plt
         fig = plt.figure(figsize=(16,9))
         ax1 = fig.add_subplot(111)
         ax1.plot(mean[:,0],mean[:,1],c="k",linewidth=2,linestyle="--")
@@ -69,16 +78,10 @@ def create_bases(mean, n_base, len_base, var_base, base_type, \
         plt.show()
     return base
 
-def adjust_base_length(base, len_total, plot=False):
-    adj_bases = np.zeros((base.shape[0], len_total, 2))
-    for i in range(base.shape[0]):
-        t = np.arange(base.shape[1])
-        ti = np.linspace(t.min(), t.max(), len_total)
-        fx = interp1d(t, base[i,:,0])
-        fy = interp1d(t, base[i,:,1])
-        adj_bases[i,:,0] = fx(ti)
-        adj_bases[i,:,1] = fy(ti)
+def adjust_base_length(base, len_total, plot=False, arc_length=False):
+    adj_bases = resample_linear(base, len_total, arc_length)
     if plot:
+        from matplotlib import pyplot as plt
         fig = plt.figure(figsize=(16,9))
         ax = fig.add_subplot(111)
         for n in range(base.shape[0]):
@@ -91,19 +94,134 @@ def adjust_base_length(base, len_total, plot=False):
     return adj_bases
 
 
-def create_samples(n_sample, len_sample, length_scale, total_scale,\
-                   kind="RBF", plot=False):
-    mean=np.zeros(len_sample)
+def covariance_function(kind, length_scale):
+    r"""Returns the stationary covariance-function /kind/ (‘RBF’ or ‘Matern’).
+
+    The function maps distances /d/ to covariances and matches the kernels
+    `RBF` and `Matern` (with the default nu=1.5) of
+    `sklearn.gaussian_process.kernels`:
+
+    - ‘RBF’: exp(-d^2 / (2 l^2)),
+    - ‘Matern’: (1 + sqrt(3) d / l) exp(-sqrt(3) d / l).
+
+    """
     if kind == "RBF":
-        cov = RBF(length_scale=length_scale)\
-                                (np.arange(len_sample)[:,np.newaxis])
+        def kernel(d):
+            return np.exp(-0.5*(np.asarray(d, dtype=float)/length_scale)**2)
     elif kind == "Matern":
-        cov = Matern(length_scale=length_scale)\
-                                (np.arange(len_sample)[:,np.newaxis])
+        def kernel(d):
+            scaled = np.sqrt(3)*np.abs(np.asarray(d, dtype=float))/length_scale
+            return (1 + scaled)*np.exp(-scaled)
+    else:
+        raise ValueError("Invalid covariance-type: "+str(kind))
+    return kernel
+
+@lru_cache(maxsize=16)
+def covariance_factor(kind, length_scale, len_sample):
+    r"""Factorizes the covariance-matrix of the sample trajectories.
+
+    The factor is cached per (/kind/, /length_scale/, /len_sample/), so
+    repeated runs with the same settings never factorize again. The
+    Cholesky-decomposition is tried with increasing jitter on the
+    diagonal, as the RBF-covariance is numerically singular for larger
+    length-scales. If all attempts fail an eigen-decomposition is used.
+
+    Parameters
+    ----------
+    kind : *str*
+        Kind of the covariance-function, ‘RBF’ or ‘Matern’.
+    length_scale : *float*
+        Length-scale of the covariance-function.
+    len_sample : *int*
+        Number of points of the sample trajectories.
+
+    Returns
+    -------
+    factor : *array*
+        Read-only array /F/ of shape /(len_sample, len_sample)/ with
+        /F F^T/ approximating the covariance-matrix.
+
+    """
+    points = np.arange(len_sample)
+    cov = covariance_function(kind, length_scale)\
+                             (points[:,np.newaxis] - points[np.newaxis])
+    for jitter in (0, 1e-12, 1e-10, 1e-8, 1e-6):
+        try:
+            factor = np.linalg.cholesky(cov + jitter*np.eye(len_sample))
+            break
+        except np.linalg.LinAlgError:
+            continue
+    else:
+        eigvals, eigvecs = np.linalg.eigh(cov)
+        factor = eigvecs*np.sqrt(np.clip(eigvals, 0, None))
+    factor.setflags(write=False)
+    return factor
+
+@lru_cache(maxsize=16)
+def circulant_spectrum(kind, length_scale, len_sample, max_doublings=4):
+    r"""Spectrum of the circulant embedding of the covariance-matrix.
+
+    Both covariance-functions are stationary and the sample trajectories
+    lie on an evenly spaced grid, so the covariance-matrix is Toeplitz and
+    can be embedded into a circulant matrix of size /M/ (a power of two
+    of at least /2*(len_sample-1)/), which is diagonalized by the FFT. If
+    the embedding has negative eigenvalues /M/ is doubled up to
+    /max_doublings/ times.
+
+    Parameters
+    ----------
+    kind : *str*
+        Kind of the covariance-function, ‘RBF’ or ‘Matern’.
+    length_scale : *float*
+        Length-scale of the covariance-function.
+    len_sample : *int*
+        Number of points of the sample trajectories.
+    max_doublings : *int*
+        Number of times the embedding is enlarged. Default is 4.
+
+    Returns
+    -------
+    spectrum : *array*/*None*
+        Read-only array with the square-roots of the eigenvalues divided by
+        /M/, *None* if no positive-semidefinite embedding was found.
+
+    """
+    kernel = covariance_function(kind, length_scale)
+    size = 2**int(np.ceil(np.log2(max(2*(len_sample-1), 2))))
+    for _ in range(max_doublings+1):
+        lags = np.arange(size)
+        lags = np.minimum(lags, size-lags)
+        eigvals = np.fft.fft(kernel(lags)).real
+        if eigvals.min() >= -1e-8*eigvals.max():
+            spectrum = np.sqrt(np.clip(eigvals, 0, None)/size)
+            spectrum.setflags(write=False)
+            return spectrum
+        size *= 2
+    return None
+
+def create_samples(n_sample, len_sample, length_scale, total_scale,\
+                   kind="RBF", plot=False, sampler="dense", rng=None):
+    rng = np.random if rng is None else rng
     samples = np.zeros((n_sample,len_sample,2))
-    samples[:,:,0] = np.random.multivariate_normal(mean=mean, \
-                                cov=cov, size=n_sample)*total_scale
+    spectrum = None
+    if sampler == "fft":
+        spectrum = circulant_spectrum(kind, length_scale, len_sample)
+    elif sampler != "dense":
+        raise ValueError("Invalid sampler: "+str(sampler))
+    if spectrum is not None:
+        # Real- and imaginary part are two independent samples each.
+        n_complex = (n_sample+1)//2
+        white = rng.standard_normal((2, n_complex, len(spectrum)))
+        fft = np.fft.fft(spectrum*(white[0] + 1j*white[1]), axis=1)
+        drawn = np.concatenate((fft.real[:,:len_sample], \
+                                fft.imag[:,:len_sample]))
+        samples[:,:,0] = drawn[:n_sample]*total_scale
+    else:
+        factor = covariance_factor(kind, length_scale, len_sample)
+        samples[:,:,0] = np.matmul(rng.standard_normal((n_sample, \
+                                    len_sample)), factor.T)*total_scale
     if plot:
+        from matplotlib import pyplot as plt
         fig = plt.figure(figsize=(12,12))
         ax = fig.add_subplot(111)
         for i in range(n_sample):
@@ -113,17 +231,20 @@ def create_samples(n_sample, len_sample, length_scale, total_scale,\
     return samples
 
 def combine(base, samples, mean, plot):
-    n_per_base = int(samples.shape[0]/base.shape[0])
-    combined = np.zeros((samples.shape[0],samples.shape[1],2))
-    for i_sample in range(samples.shape[0]):
-        i_base = i_sample // n_per_base
-        combined[i_sample,0,:] = base[i_base,0,:]
-        
-        for i in range(1,samples.shape[1]):
-            theta = angle_clockwise(base[i_base,i],base[i_base,i-1])+0.5*np.pi            
-            Phi = np.array([[np.cos(theta), -np.sin(theta)],[np.sin(theta), np.cos(theta)]])
-            combined[i_sample,i,:] = base[i_base,i] + np.matmul(Phi,samples[i_sample,i])
+    n_base, len_total = base.shape[:2]
+    n_per_base = int(samples.shape[0]/n_base)
+    theta = rotation_angles(base[:,1:], base[:,:-1])[:,np.newaxis]
+    cos, sin = np.cos(theta), np.sin(theta)
+    grouped = samples[:n_base*n_per_base,1:].reshape(n_base, n_per_base, \
+                                                     len_total-1, 2)
+    combined = np.empty((n_base, n_per_base, len_total, 2))
+    combined[:,:,0,:] = base[:,np.newaxis,0,:]
+    combined[:,:,1:,0] = cos*grouped[...,0] - sin*grouped[...,1]
+    combined[:,:,1:,1] = sin*grouped[...,0] + cos*grouped[...,1]
+    combined[:,:,1:,:] += base[:,np.newaxis,1:,:]
+    combined = combined.reshape(-1, len_total, 2)
     if plot:
+        from matplotlib import pyplot as plt
         fig = plt.figure(figsize=(16,9))
         ax = fig.add_subplot(111)
         for n in range(combined.shape[0]):
@@ -140,7 +261,7 @@ def combine(base, samples, mean, plot):
 #                        len_base, base_type, var_base, \
 #                        length_scale, total_scale, kind="RBF", \
 #                        plot=False):
-def create_trajectories(x_mean, y_mean, config):
+def create_trajectories(x_mean, y_mean, config, rng=None):
     mean = np.vstack([x_mean,y_mean]).T
     n_total = config["n_total"]
     len_total = config["len_total"]
@@ -151,12 +272,14 @@ def create_trajectories(x_mean, y_mean, config):
     length_scale = config["length_scale"]
     total_scale = config["scale"]
     kind = config["cov_type"]
+    sampler = config.get("sampler", "dense")
+    arc_length = config.get("arc_length", False)
     plot = False
     
     assert(n_total%n_base == 0)
     bases = create_bases(mean, n_base, len_base, var_base, \
-                         base_type, plot)
-    adj_bases = adjust_base_length(bases, len_total, plot)
+                         base_type, plot, rng)
+    adj_bases = adjust_base_length(bases, len_total, plot, arc_length)
     samples = create_samples(n_total, len_total, length_scale, \
-                             total_scale, kind, plot)
+                             total_scale, kind, plot, sampler, rng)
     return combine(adj_bases, samples, mean, plot)
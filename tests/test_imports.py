@@ -0,0 +1,41 @@
+r"""Checks that the headless core does not load the GUI-stack."""
+import os
+import sys
+import subprocess
+import unittest
+
+TOP_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules of the GUI and of plotting, too slow to import in batch-mode.
+GUI_MODULES = ("wx", "cv2", "sklearn", "matplotlib")
+
+# Seconds /import generation/ may take. It takes about 0.2s, importing
+# scipy.signal, .ndimage and .interpolate eagerly adds about 1.5s.
+IMPORT_BUDGET = 1.0
+
+def run_python(code):
+    r"""Runs /code/ in a fresh interpreter and returns its output."""
+    result = subprocess.run([sys.executable, "-c", code], \
+                            cwd=TOP_DIRECTORY, check=True, \
+                            stdout=subprocess.PIPE, universal_newlines=True)
+    return result.stdout.strip()
+
+class TestHeadlessImport(unittest.TestCase):
+
+    def test_generation_skips_gui_modules(self):
+        # A fresh interpreter, other tests may have loaded these modules.
+        code = "import sys, generation; "+\
+               "print(' '.join(name for name in "+repr(GUI_MODULES)+\
+               " if name in sys.modules))"
+        self.assertEqual(run_python(code), "")
+
+    def test_generation_cold_start(self):
+        # Best of three, to be robust against a busy machine.
+        code = "import time; start = time.perf_counter(); "+\
+               "import generation; print(time.perf_counter()-start)"
+        seconds = min(float(run_python(code)) for _ in range(3))
+        self.assertLess(seconds, IMPORT_BUDGET, \
+                        "import generation took {:.2f}s".format(seconds))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+r"""Checks that single walks can be regenerated from their streams."""
+import os
+import unittest
+
+import numpy as np
+
+from generation import generate_walks, regenerate_walk
+from generation.batch import read_config_file
+from randomStreams import TrajectoryStreams
+
+TOP_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestRegenerateWalk(unittest.TestCase):
+
+    def setUp(self):
+        # Relative map-paths of the batch-file.
+        self.cwd = os.getcwd()
+        os.chdir(TOP_DIRECTORY)
+        self.configs = read_config_file("simulation_high_noise_5_10.batch")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def test_all_noise_modes_and_repair(self):
+        seed, n = 5, 30
+        for line in (3, 5):
+            for mode in ("gaussian", "truncate", "project"):
+                for repair in (False, True):
+                    config = dict(self.configs[line], pre_noise=40.0, \
+                                  noise_mode=mode, repair=repair)
+                    pos = generate_walks(config, n, batch=True, \
+                                         rng=TrajectoryStreams(seed, line, \
+                                                               range(n)))[0]
+                    for index in range(n):
+                        walk = regenerate_walk(config, seed, line, index)[0]
+                        msg = "line "+str(line)+", "+mode+", repair "+\
+                              str(repair)+", index "+str(index)
+                        self.assertTrue(np.array_equal(walk, pos[index]), \
+                                        msg)
+
+if __name__ == "__main__":
+    unittest.main()
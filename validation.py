@@ -1,6 +1,6 @@
 r"""Validation of traces/points against an Occupancy-grid."""
-import wx
 import warnings
+import numpy as np
 
 def validate_trace(trace_x, trace_y, worldMap, batch):
     r"""Check if a trace is valid against an Occupancy-grid.
@@ -23,12 +23,212 @@ def validate_trace(trace_x, trace_y, worldMap, batch):
 
     """
     assert (len(trace_x) > 0) and (len(trace_y) > 0) and (len(trace_x) == len(trace_y))
-    valid = True
-    for x, y in zip(trace_x, trace_y):
-        if validate_point(x, y, worldMap, batch) == False:
-            valid = False
+    try:
+        trace = np.vstack([trace_x, trace_y]).astype(float).T
+    except (TypeError, ValueError):
+        msg = "Could not convert Trace-positions to integer."
+        if batch:
+            print(msg)
+        else:
+            import wx
+            wx.MessageBox(msg, 'Error', \
+                          wx.OK | wx.ICON_ERROR)
+        raise ValueError(msg)
+    ysize, xsize = worldMap.shape
+    cells = _to_cells(trace)
+    outside = ~_inside(cells, worldMap.shape)
+    if np.any(outside):
+        x, y = cells[np.argmax(outside)]
+        if not (0 <= x < xsize):
+            msg = "Invalid Trace-X-Position: "+str(x)+" with Image-X-Size: "+str(xsize)
+        else:
+            msg = "Invalid Trace-Y-Position: "+str(y)+" with Image-Y-Size: "+str(ysize)
+        msg += "\nMaybe modify the trace-points or reduce noise to create a valid trace."
+        raise ValueError(msg)
+    valid, _ = validate_traces(trace, worldMap)
     return valid
 
+def validate_traces(traces, worldMap, out_of_bounds="reject", chunk_size=256):
+    r"""Vectorized check of one or many traces against an Occupancy-grid.
+
+    The samples of all traces are looked up in the grid with one
+    fancy-indexing operation per chunk of /chunk_size/ samples. Traces
+    are dropped from the following chunks as soon as they collided, so
+    the check stops early once every trace has a collision.
+
+    Parameters
+    ----------
+    traces : *array_like*
+        Single trace of shape /(L, 2)/ or batch of traces of shape
+        /(N, L, 2)/.
+    worldMap : *array*
+        Occupancy-grid from `mapCreation.image2array`.
+    out_of_bounds : *str*
+        Policy for samples outside of the grid. With ‘reject’ they count
+        as a collision, with ‘clip’ they are checked against the nearest
+        border-cell and with ‘ignore’ they count as free space.
+        Default is ‘reject’.
+    chunk_size : *int*
+        Number of samples per trace checked in one pass. Default is 256.
+
+    Returns
+    -------
+    valid : *bool*/*array*
+        *True* for every trace lying completely in free space, as a scalar
+        for a single trace and as an array of shape /(N,)/ otherwise.
+    first_collision : *int*/*array*
+        Index of the first colliding sample of each trace, -1 for valid
+        traces.
+
+    """
+    if out_of_bounds not in ("reject", "clip", "ignore"):
+        raise ValueError("Invalid out_of_bounds-policy: "+str(out_of_bounds))
+    traces = np.asarray(traces, dtype=float)
+    single = traces.ndim == 2
+    if single:
+        traces = traces[np.newaxis]
+    n, length = traces.shape[:2]
+    first_collision = np.full(n, -1, dtype=np.intp)
+    active = np.arange(n)
+    for start in range(0, length, chunk_size):
+        cells = _to_cells(traces[active, start:start+chunk_size])
+        blocked = _blocked(cells, worldMap, out_of_bounds)
+        hit = np.any(blocked, axis=1)
+        first_collision[active[hit]] = start + np.argmax(blocked[hit], axis=1)
+        active = active[~hit]
+        if len(active) == 0:
+            break
+    valid = first_collision < 0
+    if single:
+        return bool(valid[0]), int(first_collision[0])
+    return valid, first_collision
+
+def validate_segments(traces, distance, min_clearance=0, \
+                      out_of_bounds="reject"):
+    r"""Check the connecting segments of traces against a distance field.
+
+    Every segment whose start- or end-point is further away from the
+    nearest obstacle than the segment is long is cleared with a single
+    lookup. Only segments close to obstacles are walked cell by cell, so
+    thin walls between two samples are found without increasing the
+    number of samples.
+
+    Parameters
+    ----------
+    traces : *array_like*
+        Single trace of shape /(L, 2)/ or batch of traces of shape
+        /(N, L, 2)/.
+    distance : *array*
+        Distance field from `mapCreation.distance_field`.
+    min_clearance : *float*
+        Minimal distance in pixels every point of the walk must keep from
+        the nearest obstacle. Default is 0, which only rejects walks
+        running through occupied cells.
+    out_of_bounds : *str*
+        Policy for points outside of the grid, see `validate_traces`.
+
+    Returns
+    -------
+    valid : *bool*/*array*
+        *True* for every trace keeping the clearance along all segments.
+    first_collision : *int*/*array*
+        Index of the first sample which collides or starts a colliding
+        segment, -1 for valid traces.
+
+    """
+    if out_of_bounds not in ("reject", "clip", "ignore"):
+        raise ValueError("Invalid out_of_bounds-policy: "+str(out_of_bounds))
+    traces = np.asarray(traces, dtype=float)
+    single = traces.ndim == 2
+    if single:
+        traces = traces[np.newaxis]
+    n, length = traces.shape[:2]
+    # Free cells are at least one pixel away from the nearest obstacle.
+    limit = max(min_clearance, 0.5)
+
+    clearance = _clearance(traces, distance, out_of_bounds)
+    blocked = clearance < limit
+    start = traces[:,:-1]
+    delta = traces[:,1:] - start
+    seg_len = np.linalg.norm(delta, axis=-1)
+    # Cell-centers of any point on a segment are at most its length plus
+    # one pixel-diagonal away from the cell-center of either end-point.
+    cleared = np.maximum(clearance[:,:-1], clearance[:,1:]) - seg_len - \
+              np.sqrt(2) >= limit
+    near = np.nonzero(~cleared & ~blocked[:,:-1] & ~blocked[:,1:])
+    if len(near[0]) > 0:
+        owner, points = _crossed_cells(start[near], delta[near])
+        hit = _clearance(points, distance, out_of_bounds) < limit
+        hit_segments = np.unique(owner[hit])
+        blocked[:,:-1][near[0][hit_segments], near[1][hit_segments]] = True
+
+    hit = np.any(blocked, axis=1)
+    first_collision = np.where(hit, np.argmax(blocked, axis=1), -1)
+    valid = ~hit
+    if single:
+        return bool(valid[0]), int(first_collision[0])
+    return valid, first_collision
+
+def _crossed_cells(start, delta):
+    # Splits every segment at its crossings with the grid-lines, the
+    # midpoints of the pieces are one point in every cell the segment
+    # passes through.
+    n = len(start)
+    end = start + delta
+    low = np.floor(np.minimum(start, end))
+    crossings = (np.floor(np.maximum(start, end)) - low).astype(np.intp)
+    owners = [np.arange(n), np.arange(n)]
+    params = [np.zeros(n), np.ones(n)]
+    for axis in range(2):
+        count = crossings[:,axis]
+        owner = np.repeat(np.arange(n), count)
+        line = np.arange(len(owner)) - np.repeat(np.cumsum(count)-count, count)
+        line = low[owner,axis] + 1 + line
+        owners.append(owner)
+        params.append((line - start[owner,axis])/delta[owner,axis])
+    owner = np.concatenate(owners)
+    param = np.concatenate(params)
+    order = np.lexsort((param, owner))
+    owner, param = owner[order], param[order]
+    same = owner[:-1] == owner[1:]
+    owner = owner[:-1][same]
+    mid = (0.5*(param[:-1] + param[1:])[same])[:,np.newaxis]
+    return owner, start[owner] + mid*delta[owner]
+
+def _clearance(points, distance, out_of_bounds):
+    cells = _to_cells(points)
+    ysize, xsize = distance.shape
+    x, y = cells[...,0], cells[...,1]
+    if out_of_bounds == "clip":
+        return distance[np.clip(y, 0, ysize-1), np.clip(x, 0, xsize-1)]
+    inside = _inside(cells, distance.shape)
+    outside = 0 if out_of_bounds == "reject" else np.inf
+    clearance = np.full(inside.shape, outside, dtype=distance.dtype)
+    clearance[inside] = distance[y[inside], x[inside]]
+    return clearance
+
+def _to_cells(points):
+    # Truncation like int(), non-finite values end up outside of the grid.
+    points = np.where(np.isfinite(points), points, -1)
+    return points.astype(np.intp)
+
+def _inside(cells, shape):
+    ysize, xsize = shape
+    return (cells[...,0] >= 0) & (cells[...,0] < xsize) & \
+           (cells[...,1] >= 0) & (cells[...,1] < ysize)
+
+def _blocked(cells, worldMap, out_of_bounds):
+    ysize, xsize = worldMap.shape
+    x, y = cells[...,0], cells[...,1]
+    if out_of_bounds == "clip":
+        return worldMap[np.clip(y, 0, ysize-1), np.clip(x, 0, xsize-1)] == 1
+    inside = _inside(cells, worldMap.shape)
+    blocked = np.zeros(inside.shape, dtype=bool)
+    blocked[inside] = worldMap[y[inside], x[inside]] == 1
+    if out_of_bounds == "reject":
+        blocked |= ~inside
+    return blocked
+
 def validate_point(x, y, worldMap, batch):
     r"""Check if a pixel in the Occupancy-grid is occupied.
 
@@ -58,6 +258,7 @@ def validate_point(x, y, worldMap, batch):
         if batch:
             print(msg)
         else:
+            import wx
             wx.MessageBox(msg, 'Error', \
                           wx.OK | wx.ICON_ERROR)
         raise ValueError(msg)